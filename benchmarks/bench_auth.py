@@ -0,0 +1,56 @@
+"""
+Стоимость авторизации одного запроса (get_current_user).
+
+До: PyJWT получает PEM строку ключа и разбирает её при каждой проверке
+подписи RS256. После: ключ разобран один раз (utils/jwt_utils.py), а
+уже проверенный токен берётся из token_cache без RSA (utils/validate.py).
+
+    python benchmarks/bench_auth.py [--repeat N]
+"""
+import argparse
+import asyncio
+
+import common
+
+import jwt
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from core.security import auth_jwt
+from utils.cache import token_cache
+from utils.jwt_utils import decode_jwt
+from utils.jwt_utils import encode_jwt
+from utils.validate import get_current_user
+
+
+async def main(repeat: int) -> None:
+    token = encode_jwt({"sub": "bench@example.com", "type": "access"})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    public_pem = auth_jwt.public_key.read_text()
+
+    async def pem_each_time():
+        jwt.decode(jwt=token, key=public_pem, algorithms=[auth_jwt.algorithm])
+
+    async def preloaded_key():
+        decode_jwt(token)
+
+    async def cache_miss():
+        token_cache.clear()
+        await get_current_user(credentials)
+
+    async def cache_hit():
+        await get_current_user(credentials)
+
+    for name, fn in (
+        ("до: PEM разбирается при каждой проверке", pem_each_time),
+        ("ключ разобран заранее, без кэша", preloaded_key),
+        ("get_current_user, промах token_cache", cache_miss),
+        ("get_current_user, попадание в token_cache", cache_hit),
+    ):
+        common.report(name, *await common.measure(fn, repeat), unit="запрос")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().repeat))
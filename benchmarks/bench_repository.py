@@ -0,0 +1,113 @@
+"""
+Накладные расходы Python на запрос к бд: запросы, собранные в
+обработчике на каждый вызов, против готовых запросов репозитория
+(database/repositories/book.py).
+
+До - запросы исходных обработчиков routers/book.py: ORM сущность
+BookModels (select + scalar_one_or_none / scalars, словарь через
+GetBookSchemas.model_validate), insert(...).values(...) и update через
+ORM. После - функции репозитория. cpu - время процесса, то есть работа sqlalchemy и
+asyncpg на стороне приложения, wall включает и ответ postgres.
+
+    python benchmarks/bench_repository.py [--repeat N]
+"""
+import argparse
+import asyncio
+
+import common
+
+from sqlalchemy import select
+from sqlalchemy import insert
+from sqlalchemy import update
+from sqlalchemy import text
+
+from database.db import engine
+from database.db import AsyncSessionLocal
+from database.models.book import BookModels
+from database.schemas.book import GetBookSchemas
+from database.repositories import book as book_repository
+
+
+PAGE = 100
+NEW_BOOK = {"name": "Книга", "author": "Автор", "year_publication": None, "isnb": None, "amount": 1}
+
+
+async def main(repeat: int) -> None:
+    async with AsyncSessionLocal() as db:
+        # Строки живут только в этой транзакции и откатываются в конце
+        ids = (await db.execute(text(
+            "INSERT INTO books (name, author, amount) "
+            "SELECT 'Книга ' || g, 'Автор ' || g, 1 FROM generate_series(1, :rows) AS g RETURNING id"
+        ), {"rows": PAGE * 2})).scalars().all()
+        calls = 0
+
+        def next_id() -> int:
+            nonlocal calls
+            calls += 1
+            return ids[calls % len(ids)]
+
+        # Обработчики до работали с новой сессией на каждый запрос, поэтому
+        # загруженные сущности убираются из identity map после вызова
+        async def get_book_before():
+            book_id = next_id()
+            stmt = select(BookModels).where(BookModels.id == book_id).execution_options(expire_on_commit=False)
+            book = (await db.execute(statement=stmt)).scalar_one_or_none()
+            result = GetBookSchemas.model_validate(book).model_dump()
+            db.expunge_all()
+            return result
+
+        async def get_book_after():
+            return await book_repository.get_book(db, next_id())
+
+        async def page_before():
+            stmt = select(BookModels)\
+                    .where(BookModels.id > ids[0] - 1)\
+                    .order_by(BookModels.id)\
+                    .limit(PAGE + 1)
+            rows = (await db.execute(statement=stmt)).scalars().all()
+            books_list = [GetBookSchemas.model_validate(row).model_dump() for row in rows]
+            db.expunge_all()
+            return books_list
+
+        async def page_after():
+            return await book_repository.get_books_page(db, after_id=ids[0] - 1, limit=PAGE)
+
+        async def update_before():
+            book_id = next_id()
+            stmt = select(BookModels).where(BookModels.id == book_id).execution_options(expire_on_commit=False)
+            book = (await db.execute(statement=stmt)).scalar_one_or_none()
+            assert book is not None
+            stmt = update(BookModels).where(BookModels.id == book_id).values({"amount": 2})
+            await db.execute(statement=stmt)
+            db.expunge_all()
+
+        async def update_after():
+            assert await book_repository.update_book(db, next_id(), {"amount": 2})
+
+        async def insert_before():
+            stmt = insert(BookModels).values(NEW_BOOK).returning(BookModels.id)
+            return (await db.execute(statement=stmt)).scalar_one()
+
+        async def insert_after():
+            return await book_repository.add_book(db, NEW_BOOK)
+
+        for name, fn, per, unit in (
+            ("до: карточка книги", get_book_before, 1, "запрос"),
+            ("после: book_repository.get_book", get_book_after, 1, "запрос"),
+            (f"до: страница каталога ({PAGE} строк)", page_before, PAGE, "строку"),
+            ("после: book_repository.get_books_page", page_after, PAGE, "строку"),
+            ("до: изменение книги (select + update ORM)", update_before, 1, "запрос"),
+            ("после: book_repository.update_book", update_after, 1, "запрос"),
+            ("до: добавление книги (insert ORM)", insert_before, 1, "запрос"),
+            ("после: book_repository.add_book", insert_after, 1, "запрос"),
+        ):
+            common.report(name, *await common.measure(fn, repeat), per=per, unit=unit)
+
+        await db.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().repeat))
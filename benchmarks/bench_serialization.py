@@ -0,0 +1,84 @@
+"""
+Стоимость страницы GET /book/ на строку: выборка и кодирование в json.
+
+До: ORM объекты BookModels, GetBookSchemas.model_validate(...).model_dump()
+для каждой строки и JSONResponse (стандартный json). После: строки
+кортежами из готового запроса (database/repositories/book.py) и orjson.
+Оба варианта читают страницу через серверный курсор, как обработчик.
+Отдельно замеряется только кодирование уже выбранных строк.
+
+    python benchmarks/bench_serialization.py [--rows N] [--repeat N]
+"""
+import json
+import argparse
+import asyncio
+
+import common
+
+import orjson
+
+from fastapi.responses import JSONResponse
+
+from sqlalchemy import select
+from sqlalchemy import text
+
+from database.db import engine
+from database.db import AsyncSessionLocal
+from database.models.book import BookModels
+from database.schemas.book import GetBookSchemas
+from database.repositories import book as book_repository
+
+
+async def main(rows: int, repeat: int) -> None:
+    async with AsyncSessionLocal() as db:
+        # Строки живут только в этой транзакции и откатываются в конце
+        after_id = (await db.execute(text(
+            "INSERT INTO books (name, author, year_publication, isnb, amount) "
+            "SELECT 'Книга ' || g, 'Автор ' || g, 1900 + g % 100, 'isbn-' || g, g % 5 "
+            "FROM generate_series(1, :rows) AS g RETURNING id"
+        ), {"rows": rows})).scalars().all()[0] - 1
+
+        async def orm_pydantic_json():
+            stmt = select(BookModels).where(BookModels.id > after_id).order_by(BookModels.id).limit(rows)
+            books = await db.stream(stmt)
+            body = JSONResponse(content={
+                "books": [GetBookSchemas.model_validate(book).model_dump() async for book in books.scalars()]
+            }).body
+            # Как в обработчике со своей сессией: объекты не переиспользуются
+            db.expunge_all()
+            return body
+
+        async def tuples_orjson():
+            books = await book_repository.get_books_page(db, after_id=after_id, limit=rows - 1)
+            return orjson.dumps({"books": books})
+
+        books = await book_repository.get_books_page(db, after_id=after_id, limit=rows - 1)
+        orm_books = (await db.execute(
+            select(BookModels).where(BookModels.id > after_id).order_by(BookModels.id).limit(rows)
+        )).scalars().all()
+
+        async def encode_pydantic_json():
+            return json.dumps({"books": [GetBookSchemas.model_validate(book).model_dump() for book in orm_books]})
+
+        async def encode_orjson():
+            return orjson.dumps({"books": books})
+
+        unit = f"строку (страница {rows})"
+        for name, fn in (
+            ("до: ORM + pydantic + json", orm_pydantic_json),
+            ("после: кортежи + orjson", tuples_orjson),
+            ("только кодирование: pydantic + json", encode_pydantic_json),
+            ("только кодирование: orjson", encode_orjson),
+        ):
+            common.report(name, *await common.measure(fn, repeat, warmup=20), per=rows, unit=unit)
+
+        await db.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -0,0 +1,39 @@
+"""
+Общее для микробенчмарков: путь к коду приложения и замер времени.
+
+Бенчмарки запускаются из корня репозитория, например
+    python benchmarks/bench_auth.py
+Бенчмарки с бд ходят в postgres из настроек приложения (DBHOST, DBPORT,
+...) с применёнными миграциями. Свои строки они вставляют в транзакции,
+которая в конце откатывается, так что данные бд не меняются.
+"""
+import sys
+import time
+
+from pathlib import Path
+from typing import Awaitable
+from typing import Callable
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libraapi"))
+
+
+async def measure(fn: Callable[[], Awaitable], repeat: int, warmup: int = 100) -> tuple[float, float]:
+    """
+    Вызывает fn repeat раз после warmup прогревочных вызовов.
+
+    Возвращает:
+        (wall, cpu) - время на один вызов в микросекундах
+    """
+    for _ in range(warmup):
+        await fn()
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(repeat):
+        await fn()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return wall / repeat * 1e6, cpu / repeat * 1e6
+
+
+def report(name: str, wall: float, cpu: float, per: int = 1, unit: str = "вызов") -> None:
+    """Печатает строку результата, per - на сколько единиц делить время вызова"""
+    print(f"{name:<44} wall {wall / per:9.2f} мкс  cpu {cpu / per:9.2f} мкс  на {unit}")
@@ -0,0 +1,75 @@
+"""
+Служебные команды, запускаются из каталога libraapi:
+    python cli.py overdue-report --days 14 --format csv --output overdue.csv
+    python cli.py partitions --months-ahead 3
+    python cli.py archive --keep-months 12
+    python cli.py purge-tokens
+"""
+
+import sys
+import asyncio
+import argparse
+
+from pathlib import Path
+
+from core.config import settings
+from utils.reports import REPORT_FORMATS
+from utils.reports import write_overdue_report
+from utils.partitions import ensure_partitions
+from utils.partitions import archive_partitions
+from utils.tokens import purge_expired_tokens
+
+
+
+def overdue_report(args: argparse.Namespace) -> None:
+    total = asyncio.run(write_overdue_report(
+        path=Path(args.output),
+        report_format=args.format,
+        loan_period_days=args.days,
+    ))
+    print(f"Просроченных выдач: {total}, отчёт: {args.output}")
+
+
+def partitions(args: argparse.Namespace) -> None:
+    created = asyncio.run(ensure_partitions(months_ahead=args.months_ahead))
+    print(f"Создано секций: {len(created)}", *created, sep="\n")
+
+
+def archive(args: argparse.Namespace) -> None:
+    archived = asyncio.run(archive_partitions(keep_months=args.keep_months, schema=args.schema))
+    print(f"Перенесено в архив секций: {len(archived)}", *archived, sep="\n")
+
+
+def purge_tokens(args: argparse.Namespace) -> None:
+    purged = asyncio.run(purge_expired_tokens())
+    print(f"Удалено истёкших refresh токенов: {purged}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="cli.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("overdue-report", help="Выгрузить просроченные выдачи")
+    report.add_argument("--days", type=int, default=settings.reports.loan_period_days, help="Срок выдачи в днях")
+    report.add_argument("--format", choices=list(REPORT_FORMATS), default="ndjson")
+    report.add_argument("--output", required=True, help="Путь к файлу отчёта")
+    report.set_defaults(handler=overdue_report)
+
+    ensure = commands.add_parser("partitions", help="Создать секции inventorydata на будущие месяцы")
+    ensure.add_argument("--months-ahead", type=int, default=settings.partitions.months_ahead)
+    ensure.set_defaults(handler=partitions)
+
+    detach = commands.add_parser("archive", help="Отключить старые секции без открытых выдач")
+    detach.add_argument("--keep-months", type=int, default=settings.partitions.keep_months)
+    detach.add_argument("--schema", default=settings.partitions.archive_schema, help="Схема для отключённых секций")
+    detach.set_defaults(handler=archive)
+
+    purge = commands.add_parser("purge-tokens", help="Удалить истёкшие refresh токены")
+    purge.set_defaults(handler=purge_tokens)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -3,19 +3,323 @@ import sys
 
 from pathlib import Path
 from dotenv import load_dotenv
+from pydantic import BaseModel
+from pydantic import Field
+
+from typing import Literal
+from typing import Optional
 
 load_dotenv()
 
 BASE_DIR = Path(__file__).parent.parent
 
-DATABASE = {
-    "dbprod": {
-        "stack": "postgresql+asyncpg",
-        "dbhost": os.environ.get("DBHOST"),
-        "dbport": os.environ.get("DBPORT"),
-        "dbuser": os.environ.get("DBUSER"),
-        "dbname": os.environ.get("DBNAME"),
-        "dbpassword": os.environ.get("DBPASSWORD"),
-    }
+LogLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+
+class DatabaseSettings(BaseModel):
+    """Подключение к postgres, пул движка и кэши подготовленных запросов"""
+    stack: str = "postgresql+asyncpg"
+    host: Optional[str] = None
+    port: Optional[int] = None
+    user: Optional[str] = None
+    name: Optional[str] = None
+    password: Optional[str] = None
+    # Соединений на воркер: pool_size постоянных и до max_overflow временных
+    pool_size: int = Field(default=5, ge=1)
+    max_overflow: int = Field(default=10, ge=0)
+    # Секунд ожидания свободного соединения до ошибки
+    pool_timeout: float = Field(default=30, gt=0)
+    # Секунд до пересоздания соединения, -1 - не пересоздавать
+    pool_recycle: int = Field(default=1800, ge=-1)
+    pool_pre_ping: bool = True
+    # Кэш подготовленных запросов asyncpg и адаптера sqlalchemy на
+    # соединение; за pgbouncer в режиме transaction оба должны быть 0
+    statement_cache_size: int = Field(default=100, ge=0)
+    prepared_statement_cache_size: int = Field(default=100, ge=0)
+    # Реплика для GET запросов (те же пользователь, пароль и бд), без
+    # replica_host все запросы идут в основную бд
+    replica_host: Optional[str] = None
+    replica_port: Optional[int] = None
+    # Реплика с отставанием больше replica_max_lag секунд не используется,
+    # столько же после записи чтения процесса идут в основную бд
+    replica_max_lag: float = Field(default=1, gt=0)
+    replica_check_interval: float = Field(default=5, gt=0)
+    # Секунд, которые клиент читает из основной бд после своего изменения
+    replica_sticky: float = Field(default=5, ge=0)
+    # Соединений, которые воркер открывает при старте, None - pool_size (не больше него)
+    pool_warmup: Optional[int] = Field(default=None, ge=0)
+
+
+class LoggingSettings(BaseModel):
+    """Уровни логов приложения и sqlalchemy.engine (INFO - все запросы)"""
+    level: LogLevel = "INFO"
+    sql_level: LogLevel = "WARNING"
+
+
+class ServerSettings(BaseModel):
+    """Запуск uvicorn из main.py"""
+    host: str = "0.0.0.0"
+    port: int = 8000
+    # Процессов-воркеров, None - по числу доступных процессу ядер
+    workers: Optional[int] = Field(default=None, ge=1)
+    # Перезапуск при изменении кода, только с одним воркером
+    reload: bool = False
+    # auto выбирает uvloop и httptools, если они установлены
+    loop: Literal["auto", "asyncio", "uvloop"] = "auto"
+    http: Literal["auto", "h11", "httptools"] = "auto"
+    timeout_keep_alive: int = Field(default=5, ge=1)
+    # Секунд на завершение начатых запросов при остановке
+    timeout_graceful_shutdown: Optional[int] = Field(default=30, ge=0)
+    access_log: bool = True
+    # Секунд на проверку бд в /health/ready
+    ready_timeout: float = Field(default=2, gt=0)
+    # Применять миграции alembic перед запуском воркеров
+    run_migrations: bool = True
+
+
+class PaginationSettings(BaseModel):
+    """Размеры страниц списков и пакетных запросов по id"""
+    default_limit: int = Field(default=50, ge=1)
+    max_limit: int = Field(default=500, ge=1)
+    max_batch: int = Field(default=100, ge=1)
+
+
+class CacheEntrySettings(BaseModel):
+    """LRU кэш процесса: записей не больше maxsize, запись живёт ttl секунд (None - до вытеснения)"""
+    maxsize: int = Field(default=10000, ge=1)
+    ttl: Optional[float] = Field(default=60, gt=0)
+
+
+class TokenCacheSettings(CacheEntrySettings):
+    ttl: Optional[float] = Field(default=300, gt=0)
+
+
+class SnapshotCacheSettings(CacheEntrySettings):
+    # Снимки сбрасываются при записи в каталог, время жизни им не нужно
+    maxsize: int = Field(default=256, ge=1)
+    ttl: Optional[float] = Field(default=None, gt=0)
+
+
+class CacheSettings(BaseModel):
+    """Кэши карточек книг, читателей, проверенных токенов и снимков каталога"""
+    book: CacheEntrySettings = CacheEntrySettings()
+    reader: CacheEntrySettings = CacheEntrySettings()
+    token: TokenCacheSettings = TokenCacheSettings()
+    catalog_snapshot: SnapshotCacheSettings = SnapshotCacheSettings()
+
+
+class BulkSettings(BaseModel):
+    """Загрузка книг и читателей файлом"""
+    # Строк в одном COPY
+    chunk_size: int = Field(default=5000, ge=1)
+    # Ошибок строк в ответе, остальные только считаются
+    max_errors: int = Field(default=1000, ge=0)
+
+
+class InventorySettings(BaseModel):
+    """Выдача и возврат книг"""
+    max_open_loans: int = Field(default=3, ge=1)
+    # Позиций в пакетной выдаче или возврате
+    max_bulk: int = Field(default=100, ge=1)
+
+
+class ReportsSettings(BaseModel):
+    """Отчёты о просроченных выдачах"""
+    dir: Path = BASE_DIR / "reports"
+    loan_period_days: int = Field(default=14, ge=1)
+    # Строк, читаемых серверным курсором за раз
+    batch_size: int = Field(default=1000, ge=1)
+    # Дней, через которые файлы отчётов и ошибок удаляются
+    keep_days: float = Field(default=7, gt=0)
+
+
+class EventsSettings(BaseModel):
+    """Поток изменений каталога через NOTIFY"""
+    channel: str = "book_changes"
+    # Событий в очереди подписчика, при переполнении подписчик получает resync
+    queue_size: int = Field(default=256, ge=1)
+    keepalive: float = Field(default=15, gt=0)
+    reconnect_delay: float = Field(default=1, gt=0)
+    # Раз в ping_interval секунд слушающее подключение проверяется запросом,
+    # не ответившее за ping_timeout секунд переоткрывается
+    ping_interval: float = Field(default=10, gt=0)
+    ping_timeout: float = Field(default=5, gt=0)
+
+
+class PartitionsSettings(BaseModel):
+    """Месячные секции inventorydata"""
+    months_ahead: int = Field(default=3, ge=0)
+    # Секции старше keep_months месяцев без открытых выдач переносятся в archive_schema
+    keep_months: int = Field(default=12, ge=0)
+    archive_schema: str = "archive"
+    check_interval: float = Field(default=6 * 60 * 60, gt=0)
+
+
+class TokensSettings(BaseModel):
+    """Хранение refresh токенов"""
+    # Секунд между удалениями истёкших токенов
+    purge_interval: float = Field(default=6 * 60 * 60, gt=0)
+
+
+class HashingSettings(BaseModel):
+    """Хэширование паролей bcrypt в отдельных потоках"""
+    bcrypt_rounds: int = Field(default=12, ge=4, le=31)
+    workers: int = Field(default=2, ge=1)
+    # Ожидающих хэширования запросов, сверх них отвечаем 503
+    max_queue: int = Field(default=64, ge=1)
+
+
+class Settings(BaseModel):
+    environment: Literal["production", "development"] = "production"
+    database: DatabaseSettings = DatabaseSettings()
+    logging: LoggingSettings = LoggingSettings()
+    server: ServerSettings = ServerSettings()
+    pagination: PaginationSettings = PaginationSettings()
+    cache: CacheSettings = CacheSettings()
+    bulk: BulkSettings = BulkSettings()
+    inventory: InventorySettings = InventorySettings()
+    reports: ReportsSettings = ReportsSettings()
+    events: EventsSettings = EventsSettings()
+    partitions: PartitionsSettings = PartitionsSettings()
+    tokens: TokensSettings = TokensSettings()
+    hashing: HashingSettings = HashingSettings()
+
+
+# Значения по умолчанию, которые зависят от окружения. Заданные
+# переменные окружения важнее профиля
+PROFILES = {
+    "production": {
+        "database": {},
+        "logging": {},
+        "server": {},
+    },
+    "development": {
+        "database": {"pool_pre_ping": False, "pool_warmup": 0},
+        "logging": {"level": "DEBUG", "sql_level": "INFO"},
+        "server": {"workers": 1, "reload": True},
+    },
+}
+
+# Поле настроек -> переменная окружения
+SETTINGS_ENV = {
+    "database": {
+        "host": "DBHOST",
+        "port": "DBPORT",
+        "user": "DBUSER",
+        "name": "DBNAME",
+        "password": "DBPASSWORD",
+        "pool_size": "DB_POOL_SIZE",
+        "max_overflow": "DB_MAX_OVERFLOW",
+        "pool_timeout": "DB_POOL_TIMEOUT",
+        "pool_recycle": "DB_POOL_RECYCLE",
+        "pool_pre_ping": "DB_POOL_PRE_PING",
+        "statement_cache_size": "DB_STATEMENT_CACHE_SIZE",
+        "prepared_statement_cache_size": "DB_PREPARED_STATEMENT_CACHE_SIZE",
+        "replica_host": "DB_REPLICA_HOST",
+        "replica_port": "DB_REPLICA_PORT",
+        "replica_max_lag": "DB_REPLICA_MAX_LAG",
+        "replica_check_interval": "DB_REPLICA_CHECK_INTERVAL",
+        "replica_sticky": "DB_REPLICA_STICKY",
+        "pool_warmup": "DB_POOL_WARMUP",
+    },
+    "logging": {
+        "level": "LOG_LEVEL",
+        "sql_level": "SQL_LOG_LEVEL",
+    },
+    "server": {
+        "host": "SERVER_HOST",
+        "port": "SERVER_PORT",
+        "workers": "WEB_CONCURRENCY",
+        "reload": "SERVER_RELOAD",
+        "loop": "SERVER_LOOP",
+        "http": "SERVER_HTTP",
+        "timeout_keep_alive": "SERVER_TIMEOUT_KEEP_ALIVE",
+        "timeout_graceful_shutdown": "SERVER_TIMEOUT_GRACEFUL_SHUTDOWN",
+        "access_log": "SERVER_ACCESS_LOG",
+        "ready_timeout": "SERVER_READY_TIMEOUT",
+        "run_migrations": "RUN_MIGRATIONS",
+    },
+    "pagination": {
+        "default_limit": "PAGINATION_DEFAULT_LIMIT",
+        "max_limit": "PAGINATION_MAX_LIMIT",
+        "max_batch": "PAGINATION_MAX_BATCH",
+    },
+    "cache": {
+        "book": {"maxsize": "BOOK_CACHE_MAXSIZE", "ttl": "BOOK_CACHE_TTL"},
+        "reader": {"maxsize": "READER_CACHE_MAXSIZE", "ttl": "READER_CACHE_TTL"},
+        "token": {"maxsize": "TOKEN_CACHE_MAXSIZE", "ttl": "TOKEN_CACHE_TTL"},
+        "catalog_snapshot": {"maxsize": "CATALOG_SNAPSHOT_MAXSIZE"},
+    },
+    "bulk": {
+        "chunk_size": "BULK_CHUNK_SIZE",
+        "max_errors": "BULK_MAX_ERRORS",
+    },
+    "inventory": {
+        "max_open_loans": "INVENTORY_MAX_OPEN_LOANS",
+        "max_bulk": "INVENTORY_MAX_BULK",
+    },
+    "reports": {
+        "dir": "REPORTS_DIR",
+        "loan_period_days": "REPORTS_LOAN_PERIOD_DAYS",
+        "batch_size": "REPORTS_BATCH_SIZE",
+        "keep_days": "REPORTS_KEEP_DAYS",
+    },
+    "events": {
+        "channel": "EVENTS_CHANNEL",
+        "queue_size": "EVENTS_QUEUE_SIZE",
+        "keepalive": "EVENTS_KEEPALIVE",
+        "reconnect_delay": "EVENTS_RECONNECT_DELAY",
+        "ping_interval": "EVENTS_PING_INTERVAL",
+        "ping_timeout": "EVENTS_PING_TIMEOUT",
+    },
+    "partitions": {
+        "months_ahead": "PARTITIONS_MONTHS_AHEAD",
+        "keep_months": "PARTITIONS_KEEP_MONTHS",
+        "archive_schema": "PARTITIONS_ARCHIVE_SCHEMA",
+        "check_interval": "PARTITIONS_CHECK_INTERVAL",
+    },
+    "tokens": {
+        "purge_interval": "TOKENS_PURGE_INTERVAL",
+    },
+    "hashing": {
+        "bcrypt_rounds": "BCRYPT_ROUNDS",
+        "workers": "HASHING_WORKERS",
+        "max_queue": "HASHING_MAX_QUEUE",
+    },
 }
 
+
+def read_environ(variables: dict, defaults: dict) -> dict:
+    """
+    Значения раздела настроек: defaults из профиля, поверх них заданные
+    переменные окружения. Вложенные словари variables - вложенные разделы
+    """
+    data = dict(defaults)
+    for field, name in variables.items():
+        if isinstance(name, dict):
+            data[field] = read_environ(name, defaults.get(field, {}))
+        elif os.environ.get(name):
+            data[field] = os.environ[name]
+    return data
+
+
+def load_settings() -> Settings:
+    """
+    Собирает настройки из профиля окружения ENVIRONMENT и переменных окружения.
+
+    Возвращает:
+        Settings: проверенные настройки
+
+    Ошибки:
+        pydantic.ValidationError: неизвестное окружение или неверное значение переменной
+    """
+    environment = os.environ.get("ENVIRONMENT", "production")
+    profile = PROFILES.get(environment, {})
+
+    data = {"environment": environment}
+    for section, variables in SETTINGS_ENV.items():
+        data[section] = read_environ(variables, profile.get(section, {}))
+    return Settings.model_validate(data)
+
+
+settings = load_settings()
@@ -10,6 +10,7 @@ class AuthJWT(BaseModel):
     public_key: Path = BASE_DIR / "core" / "certs" / "public.pem"
     algorithm: str = "RS256"
     access_token_exmpire_min: int = 15
+    refresh_token_expire_days: int = 30
 
 
 auth_jwt = AuthJWT()
@@ -1,18 +1,70 @@
+from typing import Optional
+
+from sqlalchemy import URL
+from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import declarative_base
 
-from core.config import DATABASE
+from core.config import settings
+from database.pool import InstrumentedPool
+from database.pool import ReplicaPool
 
 
 Base = declarative_base()
 
-dbprod = DATABASE['dbprod']
+dbsettings = settings.database
+
 
-engine = create_async_engine(
-        url=f"{dbprod['stack']}://{dbprod['dbuser']}:{dbprod['dbpassword']}@{dbprod['dbhost']}:{dbprod['dbport']}/{dbprod['dbname']}",
-        echo=True
+def make_engine(host: Optional[str], port: Optional[int], poolclass: type[pool.Pool]) -> AsyncEngine:
+    """
+    Создаёт движок к серверу host:port с настройками пула из settings.database.
+
+    Запросы пишутся в лог sqlalchemy.engine на уровне INFO (SQL_LOG_LEVEL),
+    а не через echo, чтобы в production их можно было выключить
+    """
+    return create_async_engine(
+        url=URL.create(
+            drivername=dbsettings.stack,
+            username=dbsettings.user,
+            password=dbsettings.password,
+            host=host,
+            port=port,
+            database=dbsettings.name,
+        ),
+        poolclass=poolclass,
+        pool_size=dbsettings.pool_size,
+        max_overflow=dbsettings.max_overflow,
+        pool_timeout=dbsettings.pool_timeout,
+        pool_recycle=dbsettings.pool_recycle,
+        pool_pre_ping=dbsettings.pool_pre_ping,
+        connect_args={
+            "statement_cache_size": dbsettings.statement_cache_size,
+            "prepared_statement_cache_size": dbsettings.prepared_statement_cache_size,
+        },
     )
 
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
\ No newline at end of file
+
+engine = make_engine(dbsettings.host, dbsettings.port, InstrumentedPool)
+
+AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+# Реплика только для чтения, маршрутизацию запросов см. в dependencies/db.py
+replica_engine = None
+ReplicaSessionLocal = None
+if dbsettings.replica_host:
+    replica_engine = make_engine(dbsettings.replica_host, dbsettings.replica_port, ReplicaPool)
+    ReplicaSessionLocal = sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Подключения без пула для долгих служебных задач (отчёты, слушатель
+# изменений, обслуживание партиций), чтобы они не занимали пул запросов
+service_engine = create_async_engine(
+        engine.url,
+        poolclass=pool.NullPool,
+        connect_args={
+            "statement_cache_size": dbsettings.statement_cache_size,
+            "prepared_statement_cache_size": dbsettings.prepared_statement_cache_size,
+        },
+    )
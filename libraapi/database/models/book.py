@@ -3,6 +3,9 @@ from sqlalchemy.orm import mapped_column
 from sqlalchemy import String
 from sqlalchemy import Integer
 from sqlalchemy import Identity
+from sqlalchemy import Index
+from sqlalchemy import Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 from database.db import Base
 
@@ -10,6 +13,13 @@ from database.db import Base
 
 class BookModels(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        # Полнотекстовый поиск по названию и автору
+        Index("ix_books_search_vector", "search_vector", postgresql_using="gin"),
+        # Нечёткий поиск (опечатки) через pg_trgm
+        Index("ix_books_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_books_author_trgm", "author", postgresql_using="gin", postgresql_ops={"author": "gin_trgm_ops"}),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
@@ -17,5 +27,8 @@ class BookModels(Base):
     year_publication: Mapped[int] = mapped_column(Integer, nullable=True)
     isnb: Mapped[str] = mapped_column(String, nullable=True, unique=True)
     amount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
-    
-    
\ No newline at end of file
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed("to_tsvector('russian', name || ' ' || author)", persisted=True),
+        deferred=True,
+    )
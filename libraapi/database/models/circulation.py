@@ -0,0 +1,34 @@
+from datetime import date
+
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+from sqlalchemy import Integer
+from sqlalchemy import Date
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import text
+
+from database.db import Base
+
+
+class CirculationMonthlyModel(Base):
+    """Выдачи и возвраты книги за месяц, обновляются вместе с inventorydata"""
+    __tablename__ = "circulation_monthly"
+    __table_args__ = (
+        # Самые выдаваемые книги и авторы за последние месяцы
+        Index("ix_circulation_monthly_month", "month"),
+    )
+
+    book_id: Mapped[int] = mapped_column(Integer, ForeignKey("books.id"), primary_key=True)
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+    issued: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    returned: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+
+
+class CirculationBookModel(Base):
+    """Итоги по книге за всё время, обновляются вместе с inventorydata"""
+    __tablename__ = "circulation_books"
+
+    book_id: Mapped[int] = mapped_column(Integer, ForeignKey("books.id"), primary_key=True)
+    issued: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    on_loan: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
@@ -6,6 +6,9 @@ from sqlalchemy.orm import mapped_column
 from sqlalchemy import String
 from sqlalchemy import Integer
 from sqlalchemy import DateTime
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import text
 
 from datetime import datetime
 from database.db import Base
@@ -13,10 +16,22 @@ from database.db import Base
 
 class InventoryDataModel(Base):
     __tablename__ = "inventorydata"
+    __table_args__ = (
+        # Открытые выдачи читателя: проверка лимита при выдаче книги
+        Index("ix_inventorydata_reader_id_open", "reader_id", postgresql_where=text("date_of_return IS NULL")),
+        Index("ix_inventorydata_book_id", "book_id"),
+        # Просроченные выдачи: открытые, отсортированные по дате выдачи
+        Index("ix_inventorydata_date_of_issue_open", "date_of_issue", postgresql_where=text("date_of_return IS NULL")),
+        # История выдач читателя с курсорной пагинацией по (date_of_issue, id)
+        Index("ix_inventorydata_reader_id_history", "reader_id", text("date_of_issue DESC"), text("id DESC")),
+        # Месячные секции по дате выдачи, см. utils/partitions.py
+        {"postgresql_partition_by": "RANGE (date_of_issue)"},
+    )
     
     id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True)
-    book_id: Mapped[int] = mapped_column(Integer, nullable=False)
-    reader_id: Mapped[int] = mapped_column(Integer, nullable=False)
-    date_of_issue: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+    book_id: Mapped[int] = mapped_column(Integer, ForeignKey("books.id"), nullable=False)
+    reader_id: Mapped[int] = mapped_column(Integer, ForeignKey("reader.id"), nullable=False)
+    # Ключ секционирования обязан входить в первичный ключ
+    date_of_issue: Mapped[datetime] = mapped_column(DateTime, primary_key=True, server_default=func.now())
     date_of_return: Mapped[datetime] = mapped_column(DateTime, nullable=True)
 
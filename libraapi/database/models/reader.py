@@ -2,12 +2,20 @@ from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 from sqlalchemy import Integer
 from sqlalchemy import String
+from sqlalchemy import Index
+from sqlalchemy import text
 
 from database.db import Base
 
 class ReaderModel(Base):
     __tablename__ = "reader"
+    __table_args__ = (
+        # email уникален без учёта регистра, поиск идёт по lower(email)
+        Index("uq_reader_email_lower", text("lower(email)"), unique=True),
+        # Поиск по ФИО с учётом опечаток и по началу строки через pg_trgm
+        Index("ix_reader_fullname_trgm", "fullname", postgresql_using="gin", postgresql_ops={"fullname": "gin_trgm_ops"}),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     fullname: Mapped[str] = mapped_column(String, nullable=False)
-    email: Mapped[str] = mapped_column(String, nullable=False, unique=True)
\ No newline at end of file
+    email: Mapped[str] = mapped_column(String, nullable=False)
\ No newline at end of file
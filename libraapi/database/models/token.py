@@ -0,0 +1,32 @@
+from typing import Optional
+from datetime import datetime
+
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+from sqlalchemy import String
+from sqlalchemy import Integer
+from sqlalchemy import DateTime
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+
+from database.db import Base
+
+
+class RefreshTokenModel(Base):
+    """
+    Выданные refresh токены. Токен действителен, пока он не использован,
+    не отозван и не истёк; при обновлении он помечается использованным и
+    заменяется новым токеном того же семейства (family).
+    """
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        # Отзыв всего семейства при повторном использовании токена
+        Index("ix_refresh_tokens_family", "family"),
+    )
+
+    jti: Mapped[str] = mapped_column(String(32), primary_key=True)
+    family: Mapped[str] = mapped_column(String(32), nullable=False)
+    librarian_id: Mapped[int] = mapped_column(Integer, ForeignKey("librarian.id"), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    used_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    revoked_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,84 @@
+import time
+
+from collections import deque
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.pool import ConnectionPoolEntry
+
+
+class PoolMetrics():
+    """
+    Счётчики получения соединений из пула движка.
+
+    Время получения - от запроса соединения у пула до его выдачи, включая
+    ожидание свободного соединения и открытие нового. Перцентили считаются
+    по последним window получениям. Пул работает в одном event loop,
+    поэтому блокировки не используются.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.waits: deque[float] = deque(maxlen=window)
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+
+    def record(self, wait: float, checked_out: int) -> None:
+        self.waits.append(wait)
+        self.acquired += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def stats(self, pool: AsyncAdaptedQueuePool) -> dict:
+        waits = sorted(self.waits)
+        percentile = lambda q: round(waits[min(len(waits) - 1, int(len(waits) * q))] * 1000, 3) if waits else 0.0
+        return {
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            # До открытия всех pool_size соединений sqlalchemy хранит
+            # отрицательное значение
+            "overflow": max(pool.overflow(), 0),
+            "peak_checked_out": self.peak_checked_out,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.acquired * 1000, 3) if self.acquired else 0.0,
+            "wait_p50_ms": percentile(0.5),
+            "wait_p95_ms": percentile(0.95),
+            "wait_p99_ms": percentile(0.99),
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+pool_metrics = PoolMetrics()
+replica_pool_metrics = PoolMetrics()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool, который пишет время получения соединения в pool_metrics.
+
+    Счётчики живут вне экземпляра: engine.dispose() пересоздаёт пул
+    через recreate(), а статистика должна пережить это.
+    """
+    metrics = pool_metrics
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        self.metrics.record(time.perf_counter() - started, self.checkedout())
+        return record
+
+
+class ReplicaPool(InstrumentedPool):
+    """Пул движка реплики со своими счётчиками"""
+    metrics = replica_pool_metrics
@@ -0,0 +1,147 @@
+"""
+Запросы к таблице books.
+
+Запросы собраны один раз при импорте из колонок таблицы (Core, без ORM)
+с именованными параметрами. Sqlalchemy не строит их заново и берёт
+скомпилированный sql из кэша без пересчёта ключа, а одинаковый текст
+запроса попадает в кэш подготовленных запросов asyncpg на соединении.
+Строки отдаются словарями через row._asdict().
+"""
+from typing import Optional
+
+from sqlalchemy import String
+from sqlalchemy import Integer
+from sqlalchemy import select
+from sqlalchemy import insert
+from sqlalchemy import update
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import and_
+from sqlalchemy import any_
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models.book import BookModels
+
+
+books = BookModels.__table__
+
+# Колонки карточки книги в порядке полей GetBookSchemas
+BOOK_COLUMNS = (
+    books.c.name,
+    books.c.author,
+    books.c.year_publication,
+    books.c.isnb,
+    books.c.amount,
+    books.c.id,
+)
+
+SELECT_BOOK = select(*BOOK_COLUMNS).where(books.c.id == bindparam("book_id"))
+
+SELECT_BOOKS_BY_IDS = select(*BOOK_COLUMNS)\
+                        .where(books.c.id == any_(bindparam("book_ids", type_=ARRAY(Integer))))
+
+# Берём на одну строку больше, чтобы понять, есть ли следующая страница
+SELECT_BOOKS_PAGE = select(*BOOK_COLUMNS)\
+                        .where(books.c.id > bindparam("after_id"))\
+                        .order_by(books.c.id)\
+                        .limit(bindparam("limit"))
+
+SELECT_BOOK_EXISTS = select(books.c.id).where(books.c.id == bindparam("book_id"))
+
+INSERT_BOOK = insert(books).returning(books.c.id)
+
+# Изменяемые колонки берутся из ключей параметров
+UPDATE_BOOK = update(books).where(books.c.id == bindparam("book_id")).returning(books.c.id)
+
+DELETE_BOOK = delete(books).where(books.c.id == bindparam("book_id")).returning(books.c.id)
+
+
+def build_search(mode: str, paged: bool):
+    """Запрос поиска книг: mode fulltext или trigram, paged - продолжение по курсору (rank, id)"""
+    q = bindparam("q", type_=String)
+    if mode == "fulltext":
+        query = func.websearch_to_tsquery("russian", q)
+        rank = func.ts_rank_cd(books.c.search_vector, query)
+        condition = books.c.search_vector.op("@@")(query)
+    else:
+        rank = func.greatest(func.similarity(books.c.name, q), func.similarity(books.c.author, q))
+        condition = or_(books.c.name.op("%")(q), books.c.author.op("%")(q))
+
+    stmt = select(*BOOK_COLUMNS, rank.label("rank")).where(condition)
+    if paged:
+        stmt = stmt.where(or_(
+            rank < bindparam("last_rank"),
+            and_(rank == bindparam("last_rank"), books.c.id > bindparam("last_id", type_=Integer))
+        ))
+    return stmt.order_by(rank.desc(), books.c.id).limit(bindparam("limit"))
+
+
+SEARCH_BOOKS = {
+    (mode, paged): build_search(mode, paged)
+    for mode in ("fulltext", "trigram")
+    for paged in (False, True)
+}
+
+
+async def get_book(db: AsyncSession, book_id: int) -> Optional[dict]:
+    row = (await db.execute(SELECT_BOOK, {"book_id": book_id})).one_or_none()
+    return None if row is None else row._asdict()
+
+
+async def get_books_by_ids(db: AsyncSession, book_ids: list[int]) -> list[dict]:
+    result = await db.execute(SELECT_BOOKS_BY_IDS, {"book_ids": book_ids})
+    return [row._asdict() for row in result]
+
+
+async def get_books_page(db: AsyncSession, after_id: int, limit: int) -> list[dict]:
+    """Возвращает до limit + 1 книг с id больше after_id по возрастанию id"""
+    books_page = await db.stream(SELECT_BOOKS_PAGE, {"after_id": after_id, "limit": limit + 1})
+    # Пачками из курсора: async for по строкам ждёт каждую строку отдельно
+    # и обходится примерно вдвое дороже (benchmarks/bench_repository.py)
+    books = []
+    async for rows in books_page.partitions():
+        books.extend(row._asdict() for row in rows)
+    return books
+
+
+async def search_books(
+        db: AsyncSession,
+        mode: str,
+        q: str,
+        limit: int,
+        after: Optional[tuple] = None
+    ) -> list[dict]:
+    """
+    Ищет книги, возвращает до limit + 1 строк с rank.
+
+    Параметры:
+        mode: str - fulltext или trigram
+        after: tuple, optional - (rank, id) последней книги предыдущей страницы
+    """
+    params = {"q": q, "limit": limit + 1}
+    if after is not None:
+        params["last_rank"], params["last_id"] = after
+    result = await db.execute(SEARCH_BOOKS[(mode, after is not None)], params)
+    return [row._asdict() for row in result]
+
+
+async def book_exists(db: AsyncSession, book_id: int) -> bool:
+    return (await db.execute(SELECT_BOOK_EXISTS, {"book_id": book_id})).scalar_one_or_none() is not None
+
+
+async def add_book(db: AsyncSession, values: dict) -> int:
+    return (await db.execute(INSERT_BOOK, values)).scalar_one()
+
+
+async def update_book(db: AsyncSession, book_id: int, values: dict) -> bool:
+    """Обновляет книгу, возвращает False если книги нет"""
+    result = await db.execute(UPDATE_BOOK, {**values, "book_id": book_id})
+    return result.scalar_one_or_none() is not None
+
+
+async def delete_book(db: AsyncSession, book_id: int) -> bool:
+    """Удаляет книгу, возвращает False если книги нет"""
+    return (await db.execute(DELETE_BOOK, {"book_id": book_id})).scalar_one_or_none() is not None
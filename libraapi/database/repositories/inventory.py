@@ -0,0 +1,253 @@
+"""Запросы выдачи и возврата книг, собранные при импорте (см. repositories/book.py)"""
+from typing import Optional
+from datetime import datetime
+
+from sqlalchemy import Row
+from sqlalchemy import Integer
+from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy import insert
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import any_
+from sqlalchemy import bindparam
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models.inventory import InventoryDataModel
+from database.models.book import BookModels
+from database.models.reader import ReaderModel
+from utils.circulation import record_circulation
+from utils.circulation import counts_select
+from utils.circulation import counts_params
+from utils.partitions import loan_horizon
+
+
+loans = InventoryDataModel.__table__
+books = BookModels.__table__
+readers = ReaderModel.__table__
+
+# Параметры UPDATE и INSERT не называются как колонки таблицы: такие ключи
+# sqlalchemy добавляет в SET / VALUES запроса
+
+# Открытые выдачи ищутся только в секциях не старше loan_horizon.since
+# (см. utils/partitions.py), остальные секции postgres отсекает
+OPEN_SINCE = bindparam("open_since", type_=loans.c.date_of_issue.type)
+
+# Блокирует читателя до конца транзакции, чтобы лимит считался без гонок
+LOCK_READER = select(readers.c.id)\
+                .where(readers.c.id == bindparam("reader_id"))\
+                .with_for_update()
+
+
+def build_issue():
+    """
+    Считает не сданные книги читателя, списывает экземпляр и записывает
+    выдачу одним запросом, тем же запросом обновляет сводки аналитики
+    """
+    open_loans = select(func.count().label("amount"))\
+                    .where(
+                        loans.c.reader_id == bindparam("loan_reader_id", type_=Integer),
+                        loans.c.date_of_return == None,
+                        loans.c.date_of_issue >= OPEN_SINCE
+                        )\
+                    .cte("open_loans")
+    issued_book = update(books)\
+                    .where(
+                        books.c.id == bindparam("loan_book_id"),
+                        books.c.amount > 0,
+                        select(open_loans.c.amount).scalar_subquery() < bindparam("max_open_loans")
+                        )\
+                    .values(amount = books.c.amount - 1)\
+                    .returning(books.c.id, books.c.amount)\
+                    .cte("issued_book")
+    loan = insert(loans)\
+                    .from_select(
+                        ["book_id", "reader_id"],
+                        select(issued_book.c.id, bindparam("loan_reader_id", type_=Integer))
+                        )\
+                    .returning(loans.c.id, loans.c.book_id)\
+                    .cte("loan")
+    return select(
+        select(open_loans.c.amount).scalar_subquery().label("open_loans"),
+        select(loan.c.id).scalar_subquery().label("loan_id"),
+        select(issued_book.c.amount).scalar_subquery().label("amount"),
+    ).add_cte(*record_circulation(select(loan.c.book_id, literal(1).label("amount")), "issue"))
+
+
+def build_return():
+    """Закрывает открытую выдачу и возвращает экземпляр на полку одним запросом"""
+    closed_loan = update(loans)\
+                    .where(
+                        loans.c.id == bindparam("loan_id"),
+                        loans.c.book_id == bindparam("loan_book_id"),
+                        loans.c.date_of_return == None,
+                        loans.c.date_of_issue >= OPEN_SINCE
+                        )\
+                    .values(date_of_return = bindparam("now"))\
+                    .returning(loans.c.book_id)\
+                    .cte("closed_loan")
+    returned_book = update(books)\
+                    .where(books.c.id.in_(select(closed_loan.c.book_id)))\
+                    .values(amount = books.c.amount + 1)\
+                    .returning(books.c.id, books.c.amount)\
+                    .cte("returned_book")
+    return select(returned_book.c.id, returned_book.c.amount)\
+            .add_cte(*record_circulation(select(closed_loan.c.book_id, literal(1).label("amount")), "return"))
+
+
+ISSUE_BOOK = build_issue()
+RETURN_BOOK = build_return()
+
+# Пакетные выдачи и возвраты: читатели и книги блокируются по возрастанию id,
+# чтобы параллельные пачки не взаимоблокировались
+LOCK_READERS = select(readers.c.id)\
+                .where(readers.c.id == any_(bindparam("reader_ids", type_=ARRAY(Integer))))\
+                .order_by(readers.c.id)\
+                .with_for_update()
+
+COUNT_OPEN_LOANS = select(loans.c.reader_id, func.count())\
+                    .where(
+                        loans.c.reader_id == any_(bindparam("reader_ids", type_=ARRAY(Integer))),
+                        loans.c.date_of_return == None,
+                        loans.c.date_of_issue >= OPEN_SINCE
+                        )\
+                    .group_by(loans.c.reader_id)
+
+LOCK_BOOKS = select(books.c.id, books.c.amount)\
+                .where(books.c.id == any_(bindparam("book_ids", type_=ARRAY(Integer))))\
+                .order_by(books.c.id)\
+                .with_for_update()
+
+TAKE_BOOKS = text(
+    "UPDATE books SET amount = books.amount - taken.amount "
+    "FROM unnest(:book_ids, :amounts) AS taken(id, amount) "
+    "WHERE books.id = taken.id"
+).bindparams(
+    bindparam("book_ids", type_=ARRAY(Integer)),
+    bindparam("amounts", type_=ARRAY(Integer)),
+)
+
+INSERT_LOANS = insert(loans).returning(loans.c.id, sort_by_parameter_order=True)
+
+RETURN_BOOKS = text(
+    "WITH closed_loan AS ("
+    "UPDATE inventorydata SET date_of_return = :now "
+    "FROM unnest(:ids, :book_ids) AS returned(id, book_id) "
+    "WHERE inventorydata.id = returned.id "
+    "AND inventorydata.book_id = returned.book_id "
+    "AND inventorydata.date_of_return IS NULL "
+    "AND inventorydata.date_of_issue >= :open_since "
+    "RETURNING inventorydata.id, inventorydata.book_id"
+    "), returned_book AS ("
+    "UPDATE books SET amount = books.amount + closed.amount "
+    "FROM (SELECT book_id, count(*) AS amount FROM closed_loan GROUP BY book_id) AS closed "
+    "WHERE books.id = closed.book_id"
+    ") SELECT id, book_id FROM closed_loan"
+).bindparams(
+    bindparam("now", type_=loans.c.date_of_return.type),
+    OPEN_SINCE,
+    bindparam("ids", type_=ARRAY(Integer)),
+    bindparam("book_ids", type_=ARRAY(Integer)),
+)
+
+RECORD_ISSUES = select(literal(1)).add_cte(*record_circulation(counts_select(), "issue"))
+RECORD_RETURNS = select(literal(1)).add_cte(*record_circulation(counts_select(), "return"))
+
+
+async def lock_reader(db: AsyncSession, reader_id: int) -> bool:
+    """Блокирует строку читателя, возвращает False если читателя нет"""
+    return (await db.execute(LOCK_READER, {"reader_id": reader_id})).scalar_one_or_none() is not None
+
+
+async def issue_book(db: AsyncSession, book_id: int, reader_id: int, max_open_loans: int) -> Row:
+    """
+    Выдаёт книгу, если у читателя меньше max_open_loans открытых выдач и есть экземпляр.
+
+    Возвращает:
+        Row: open_loans - открытых выдач до выдачи, loan_id - id выдачи
+        или None если книга не выдана, amount - остаток книги после выдачи
+    """
+    params = {
+        "loan_book_id": book_id,
+        "loan_reader_id": reader_id,
+        "max_open_loans": max_open_loans,
+        "open_since": loan_horizon.since,
+    }
+    return (await db.execute(ISSUE_BOOK, params)).one()
+
+
+async def return_book(db: AsyncSession, loan_id: int, book_id: int) -> Optional[Row]:
+    """
+    Закрывает открытую выдачу loan_id книги book_id.
+
+    Возвращает:
+        Row | None - id и amount (остаток) книги или None если открытой выдачи нет
+    """
+    params = {"loan_id": loan_id, "loan_book_id": book_id, "now": datetime.now(), "open_since": loan_horizon.since}
+    return (await db.execute(RETURN_BOOK, params)).one_or_none()
+
+
+async def lock_readers(db: AsyncSession, reader_ids: list[int]) -> set[int]:
+    """Блокирует читателей, возвращает id существующих"""
+    return set((await db.execute(LOCK_READERS, {"reader_ids": reader_ids})).scalars().all())
+
+
+async def count_open_loans(db: AsyncSession, reader_ids: list[int]) -> dict[int, int]:
+    """Возвращает reader_id -> число открытых выдач для читателей, у которых они есть"""
+    params = {"reader_ids": reader_ids, "open_since": loan_horizon.since}
+    return dict((await db.execute(COUNT_OPEN_LOANS, params)).all())
+
+
+async def lock_books(db: AsyncSession, book_ids: list[int]) -> dict[int, int]:
+    """Блокирует книги, возвращает book_id -> остаток для существующих"""
+    return dict((await db.execute(LOCK_BOOKS, {"book_ids": book_ids})).all())
+
+
+async def issue_books(db: AsyncSession, taken: dict[int, int], items: list[dict]) -> list[int]:
+    """
+    Списывает остатки и записывает выдачи пачки, обновляет сводки аналитики.
+
+    Параметры:
+        taken: dict - book_id -> сколько экземпляров списать
+        items: list - {"book_id", "reader_id"} для каждой выдачи
+
+    Возвращает:
+        list[int] - id выдач в порядке items
+    """
+    await db.execute(TAKE_BOOKS, {"book_ids": list(taken.keys()), "amounts": list(taken.values())})
+    loan_ids = (await db.execute(INSERT_LOANS, items)).scalars().all()
+    await db.execute(RECORD_ISSUES, counts_params(taken))
+    return loan_ids
+
+
+async def return_books(db: AsyncSession, items: list[tuple[int, int]]) -> dict[int, int]:
+    """
+    Закрывает открытые выдачи пачки и возвращает экземпляры, обновляет сводки аналитики.
+
+    Книги пачки сначала блокируются по возрастанию id: UPDATE books внутри
+    RETURN_BOOKS берёт блокировки в порядке соединения, и две пачки с общими
+    книгами могли бы взаимоблокироваться. Пачки с общими выдачами всегда
+    имеют и общие книги, поэтому блокировка книг упорядочивает и их.
+
+    Параметры:
+        items: list - (id выдачи, book_id)
+
+    Возвращает:
+        dict - id закрытой выдачи -> book_id
+    """
+    await lock_books(db, list({book_id for _, book_id in items}))
+    params = {
+        "now": datetime.now(),
+        "open_since": loan_horizon.since,
+        "ids": [loan_id for loan_id, _ in items],
+        "book_ids": [book_id for _, book_id in items],
+    }
+    closed = dict((await db.execute(RETURN_BOOKS, params)).all())
+    if closed:
+        returned = {}
+        for book_id in closed.values():
+            returned[book_id] = returned.get(book_id, 0) + 1
+        await db.execute(RECORD_RETURNS, counts_params(returned))
+    return closed
@@ -0,0 +1,94 @@
+"""Запросы к таблицам librarian и refresh_tokens, собранные при импорте (см. repositories/book.py)"""
+from typing import Optional
+from datetime import datetime
+
+from sqlalchemy import Row
+from sqlalchemy import select
+from sqlalchemy import insert
+from sqlalchemy import update
+from sqlalchemy import delete
+from sqlalchemy import bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models.librarian import LibrarianModel
+from database.models.token import RefreshTokenModel
+
+
+librarians = LibrarianModel.__table__
+refresh_tokens = RefreshTokenModel.__table__
+
+SELECT_LIBRARIAN_BY_EMAIL = select(librarians.c.id, librarians.c.email, librarians.c.password)\
+                                .where(librarians.c.email == bindparam("email"))
+
+INSERT_LIBRARIAN = insert(librarians)
+
+# Условие по старому хэшу не даёт затереть пароль, сменённый параллельно
+REHASH_PASSWORD = update(librarians)\
+                    .where(
+                        librarians.c.id == bindparam("librarian_id"),
+                        librarians.c.password == bindparam("old_password")
+                        )\
+                    .values(password = bindparam("new_password"))
+
+INSERT_REFRESH_TOKEN = insert(refresh_tokens)
+
+# Помечает токен использованным, только если он ещё действует
+USE_REFRESH_TOKEN = update(refresh_tokens)\
+                    .where(
+                        refresh_tokens.c.jti == bindparam("token_jti"),
+                        refresh_tokens.c.used_at == None,
+                        refresh_tokens.c.revoked_at == None,
+                        refresh_tokens.c.expires_at > bindparam("now")
+                        )\
+                    .values(used_at = bindparam("now"))\
+                    .returning(refresh_tokens.c.librarian_id)
+
+REVOKE_TOKEN_FAMILY = update(refresh_tokens)\
+                        .where(
+                            refresh_tokens.c.family == bindparam("token_family"),
+                            refresh_tokens.c.revoked_at == None
+                            )\
+                        .values(revoked_at = bindparam("now"))
+
+# Истёкший токен не пройдёт проверку подписи jwt, запись о нём больше не нужна
+PURGE_REFRESH_TOKENS = delete(refresh_tokens)\
+                        .where(refresh_tokens.c.expires_at < bindparam("now"))
+
+
+async def get_librarian_by_email(db: AsyncSession, email: str) -> Optional[Row]:
+    """Возвращает id, email и хэш пароля библиотекаря или None"""
+    return (await db.execute(SELECT_LIBRARIAN_BY_EMAIL, {"email": email})).one_or_none()
+
+
+async def add_librarian(db: AsyncSession, email: str, password: str) -> None:
+    await db.execute(INSERT_LIBRARIAN, {"email": email, "password": password})
+
+
+async def rehash_password(db: AsyncSession, librarian_id: int, old_password: str, new_password: str) -> None:
+    params = {"librarian_id": librarian_id, "old_password": old_password, "new_password": new_password}
+    await db.execute(REHASH_PASSWORD, params)
+
+
+async def add_refresh_token(
+        db: AsyncSession,
+        jti: str,
+        family: str,
+        librarian_id: int,
+        expires_at: datetime
+    ) -> None:
+    params = {"jti": jti, "family": family, "librarian_id": librarian_id, "expires_at": expires_at}
+    await db.execute(INSERT_REFRESH_TOKEN, params)
+
+
+async def use_refresh_token(db: AsyncSession, jti: str, now: datetime) -> Optional[int]:
+    """Помечает токен использованным, возвращает librarian_id или None если токен не действует"""
+    return (await db.execute(USE_REFRESH_TOKEN, {"token_jti": jti, "now": now})).scalar_one_or_none()
+
+
+async def revoke_token_family(db: AsyncSession, family: str, now: datetime) -> None:
+    await db.execute(REVOKE_TOKEN_FAMILY, {"token_family": family, "now": now})
+
+
+async def purge_refresh_tokens(db: AsyncSession, now: datetime) -> int:
+    """Удаляет истёкшие к now refresh токены, возвращает число удалённых"""
+    return (await db.execute(PURGE_REFRESH_TOKENS, {"now": now})).rowcount
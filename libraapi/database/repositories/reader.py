@@ -0,0 +1,162 @@
+"""Запросы к таблице reader и выдачам читателя, собранные при импорте (см. repositories/book.py)"""
+from typing import Optional
+
+from sqlalchemy import String
+from sqlalchemy import Integer
+from sqlalchemy import select
+from sqlalchemy import insert
+from sqlalchemy import delete
+from sqlalchemy import tuple_
+from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import and_
+from sqlalchemy import case
+from sqlalchemy import literal
+from sqlalchemy import bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models.reader import ReaderModel
+from database.models.inventory import InventoryDataModel
+from database.models.book import BookModels
+from utils.partitions import loan_horizon
+
+
+readers = ReaderModel.__table__
+loans = InventoryDataModel.__table__
+books = BookModels.__table__
+
+# Колонки карточки читателя
+READER_COLUMNS = (
+    readers.c.email,
+    readers.c.fullname,
+    readers.c.id,
+)
+
+# Колонки выдачи вместе с данными книги для списков выдач читателя
+LOAN_COLUMNS = (
+    loans.c.id,
+    loans.c.book_id,
+    books.c.name,
+    books.c.author,
+    books.c.isnb,
+    loans.c.date_of_issue,
+    loans.c.date_of_return,
+)
+
+# Поиск идёт по уникальному индексу lower(email)
+SELECT_READER_BY_EMAIL = select(*READER_COLUMNS)\
+                            .where(func.lower(readers.c.email) == bindparam("email"))
+
+INSERT_READER = insert(readers)
+
+DELETE_READER = delete(readers).where(readers.c.id == bindparam("reader_id")).returning(readers.c.email)
+
+
+def build_search(paged: bool):
+    """Запрос поиска читателей по ФИО, paged - продолжение по курсору (rank, id)"""
+    prefix = readers.c.fullname.istartswith(bindparam("prefix", type_=String), escape="/")
+    rank = (
+        case((prefix, literal(1.0)), else_=literal(0.0))
+        + func.word_similarity(bindparam("q", type_=String), readers.c.fullname)
+    ).label("rank")
+    stmt = select(*READER_COLUMNS, rank)\
+            .where(or_(prefix, readers.c.fullname.op("%>")(bindparam("q", type_=String))))
+    if paged:
+        stmt = stmt.where(or_(
+            rank < bindparam("last_rank"),
+            and_(rank == bindparam("last_rank"), readers.c.id > bindparam("last_id", type_=Integer))
+        ))
+    return stmt.order_by(rank.desc(), readers.c.id).limit(bindparam("limit"))
+
+
+SEARCH_READERS = {paged: build_search(paged) for paged in (False, True)}
+
+SELECT_OPEN_LOANS = select(*LOAN_COLUMNS)\
+                        .join(books, books.c.id == loans.c.book_id)\
+                        .where(
+                            loans.c.reader_id == bindparam("reader_id"),
+                            loans.c.date_of_return == None,
+                            loans.c.date_of_issue >= bindparam("open_since", type_=loans.c.date_of_issue.type)
+                            )\
+                        .order_by(loans.c.date_of_issue.desc(), loans.c.id.desc())
+
+
+def build_loans_history(paged: bool):
+    stmt = select(*LOAN_COLUMNS)\
+            .join(books, books.c.id == loans.c.book_id)\
+            .where(loans.c.reader_id == bindparam("reader_id"))
+    if paged:
+        stmt = stmt.where(
+            tuple_(loans.c.date_of_issue, loans.c.id) < tuple_(
+                bindparam("last_issue", type_=loans.c.date_of_issue.type),
+                bindparam("last_id", type_=Integer)
+            )
+        )
+    return stmt.order_by(loans.c.date_of_issue.desc(), loans.c.id.desc())\
+                .limit(bindparam("limit"))
+
+
+SELECT_LOANS_HISTORY = {paged: build_loans_history(paged) for paged in (False, True)}
+
+
+def escape_like(value: str) -> str:
+    """Экранирует % и _ для LIKE с ESCAPE '/'"""
+    return value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+
+async def get_reader_by_email(db: AsyncSession, email: str) -> Optional[dict]:
+    """Ищет читателя по email без учёта регистра"""
+    row = (await db.execute(SELECT_READER_BY_EMAIL, {"email": email.lower()})).one_or_none()
+    return None if row is None else row._asdict()
+
+
+async def add_reader(db: AsyncSession, values: dict) -> None:
+    await db.execute(INSERT_READER, values)
+
+
+async def delete_reader(db: AsyncSession, reader_id: int) -> Optional[str]:
+    """Удаляет читателя, возвращает его email или None если читателя нет"""
+    return (await db.execute(DELETE_READER, {"reader_id": reader_id})).scalar_one_or_none()
+
+
+async def search_readers(
+        db: AsyncSession,
+        q: str,
+        limit: int,
+        after: Optional[tuple] = None
+    ) -> list[dict]:
+    """
+    Ищет читателей по ФИО, возвращает до limit + 1 строк с rank.
+
+    Параметры:
+        after: tuple, optional - (rank, id) последнего читателя предыдущей страницы
+    """
+    params = {"q": q, "prefix": escape_like(q), "limit": limit + 1}
+    if after is not None:
+        params["last_rank"], params["last_id"] = after
+    result = await db.execute(SEARCH_READERS[after is not None], params)
+    return [row._asdict() for row in result]
+
+
+async def get_open_loans(db: AsyncSession, reader_id: int) -> list[dict]:
+    result = await db.execute(SELECT_OPEN_LOANS, {"reader_id": reader_id, "open_since": loan_horizon.since})
+    return [row._asdict() for row in result]
+
+
+async def get_loans_history(
+        db: AsyncSession,
+        reader_id: int,
+        limit: int,
+        after: Optional[tuple] = None
+    ) -> list[dict]:
+    """
+    Возвращает до limit + 1 выдач читателя от новых к старым.
+
+    Параметры:
+        after: tuple, optional - (date_of_issue, id) последней выдачи предыдущей страницы
+    """
+    params = {"reader_id": reader_id, "limit": limit + 1}
+    if after is not None:
+        params["last_issue"], params["last_id"] = after
+    result = await db.execute(SELECT_LOANS_HISTORY[after is not None], params)
+    return [row._asdict() for row in result]
@@ -16,4 +16,11 @@ class IssueBookScheme(
 
 class ReturnBookScheme(InventoryBaseScheme):
     id: int
-    
\ No newline at end of file
+    
+
+class BulkIssueBookScheme(BaseModel):
+    items: list[IssueBookScheme]
+
+
+class BulkReturnBookScheme(BaseModel):
+    items: list[ReturnBookScheme]
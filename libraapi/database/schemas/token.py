@@ -1,5 +1,11 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 class JWTScheme(BaseModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    refresh_token: Optional[str] = None
+    token_type: str
+
+class RefreshTokenScheme(BaseModel):
+    refresh_token: str
@@ -1,9 +1,67 @@
+from fastapi import Request
+
+from sqlalchemy import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.db import engine
+from database.db import replica_engine
 from database.db import AsyncSessionLocal
+from utils.replica import READ_METHODS
+from utils.replica import replica_state
+
 
+class ReplicaRoutingSession(Session):
+    """
+    Сессия чтения: пока info["replica"] истинно, запросы идут на реплику.
 
-async def async_get_db():
-    async with AsyncSessionLocal() as db:
+    Соединение берётся при первом запросе, а не при открытии сессии,
+    поэтому ответ 304 или из кэша процесса реплику не трогает. Если
+    подключиться к реплике не удалось, реплика отмечается недоступной,
+    а запрос и вся сессия переходят на основную бд.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw) -> Engine:
+        if self.info.get("replica"):
+            return replica_engine.sync_engine
+        return engine.sync_engine
+
+    def _connection_for_bind(self, engine, execution_options=None, **kw):
+        # Закрытый метод Session, через него проходит каждое получение
+        # соединения (как _do_get в database/pool.py)
         try:
-            yield db
-        finally:
-            await db.close()
\ No newline at end of file
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        except (OSError, SQLAlchemyError) as error:
+            if not self.info.get("replica") or engine is not replica_engine.sync_engine:
+                raise
+            replica_state.mark_down(error)
+            self.info["replica"] = False
+            return super()._connection_for_bind(self.get_bind(), execution_options, **kw)
+
+
+ReadSessionLocal = sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=ReplicaRoutingSession,
+    expire_on_commit=False
+)
+
+
+async def async_get_db(request: Request):
+    """
+    Сессия бд для запроса.
+
+    Чтения (GET, HEAD, OPTIONS) идут на реплику, если она настроена и
+    доступна, а клиент не менял данные последние replica_sticky секунд
+    (см. ReplicaState.serves), остальные запросы и все чтения при
+    недоступной реплике - в основную бд.
+    """
+    if request.method in READ_METHODS and replica_state.serves(request):
+        db = ReadSessionLocal(info={"replica": True})
+    else:
+        db = AsyncSessionLocal()
+
+    async with db:
+        yield db
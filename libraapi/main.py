@@ -1,24 +1,123 @@
+import os
+import math
+import time
+import asyncio
+import logging
+
 import uvicorn
-import asyncio 
+
+from pathlib import Path
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from alembic import command
+from alembic.config import Config
+
 from routers.book import router as book_router
 from routers.reader import router as reader_router
 from routers.librarian import router as librarian_router
 from routers.inventory import router as inventory_router
+from routers.internal import router as internal_router
+from routers.report import router as report_router
+from routers.analytics import router as analytics_router
+from routers.health import router as health_router
+
+from core.config import BASE_DIR
+from core.config import settings
+from database.db import AsyncSessionLocal
+from database.db import ReplicaSessionLocal
+from utils.events import change_bus
+from utils.replica import replica_state
+from utils.replica import ReadYourWritesMiddleware
+from utils.partitions import ensure_partitions
+from utils.partitions import maintain_partitions
+from utils.partitions import loan_horizon
+from utils.tokens import maintain_tokens
+from utils.lifecycle import lifecycle
+from utils.lifecycle import warm_up_pool
+from utils.lifecycle import warm_up_jwt
+from utils.lifecycle import cancel_tasks
+from utils.lifecycle import dispose_engines
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запуск и остановка воркера.
+
+    При старте досоздаёт секции inventorydata и считает loan_horizon,
+    проверяет реплику, прогревает пулы соединений и RSA ключи JWT,
+    запускает фоновые задачи (слушатель изменений каталога, секции,
+    очистка истёкших refresh токенов, проверка реплики) и только после
+    этого отмечает воркер готовым для /health/ready. При остановке снимает
+    готовность, останавливает задачи и закрывает соединения с бд.
+    """
+    started = time.perf_counter()
+    await ensure_partitions()
+    await loan_horizon.refresh()
+    if replica_state.enabled:
+        await replica_state.check()
+
+    # Больше pool_size прогревать незачем: соединения сверх него пул
+    # закрывает при возврате
+    warmup = settings.database.pool_size
+    if settings.database.pool_warmup is not None:
+        warmup = min(settings.database.pool_warmup, warmup)
+    warm_ups = [warm_up_pool(AsyncSessionLocal, warmup)]
+    if replica_state.healthy:
+        warm_ups.append(warm_up_pool(ReplicaSessionLocal, warmup))
+    lifecycle.pool_connections, *replica_connections = await asyncio.gather(*warm_ups)
+    lifecycle.replica_connections = sum(replica_connections)
+    warm_up_jwt()
+
+    partitions_task = asyncio.create_task(maintain_partitions())
+    tokens_task = asyncio.create_task(maintain_tokens())
+    replica_task = asyncio.create_task(replica_state.monitor()) if replica_state.enabled else None
+    change_bus.start()
+
+    lifecycle.startup_ms = round((time.perf_counter() - started) * 1000, 1)
+    lifecycle.ready = True
+    logger.info(
+        "Воркер %s готов за %s мс: event loop %s, соединений прогрето %s, реплики %s",
+        os.getpid(), lifecycle.startup_ms, type(asyncio.get_running_loop()).__module__,
+        lifecycle.pool_connections, lifecycle.replica_connections
+    )
+    yield
+    lifecycle.ready = False
+    lifecycle.stopping = True
+    await change_bus.stop()
+    await cancel_tasks(partitions_task, tokens_task, replica_task)
+    await dispose_engines()
+
+
+def configure_logging() -> None:
+    """
+    Настройка логов: запросы к бд видны при SQL_LOG_LEVEL=INFO.
 
-from database.db import engine
-from database.db import Base
+    Вызывается повторно после миграций: env.py alembic применяет
+    logging из alembic.ini поверх настроек приложения
+    """
+    logging.basicConfig(level=settings.logging.level, force=True)
+    logging.getLogger("sqlalchemy.engine").setLevel(settings.logging.sql_level)
 
-app = FastAPI()
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+app = FastAPI(lifespan=lifespan)
 
 """Подключаем роутеры"""
 app.include_router(book_router, tags=["Книги"])
 app.include_router(reader_router, tags=["Читатели"])
 app.include_router(librarian_router, tags=["Библиотекари"])
 app.include_router(inventory_router, tags=["Инвентаризация"])
+app.include_router(report_router, tags=["Отчёты"])
+app.include_router(analytics_router, tags=["Аналитика"])
+app.include_router(internal_router, tags=["Служебное"])
+app.include_router(health_router, tags=["Служебное"])
 
 
 """Настройка корс"""
@@ -30,19 +129,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+"""Чтение своих изменений из основной бд, пока реплика отстаёт"""
+if replica_state.enabled:
+    app.add_middleware(ReadYourWritesMiddleware)
 
-async def create_tables() -> None:
-    """Создание всех необходимых таблицы"""
+
+def run_migrations() -> None:
+    """Применяет миграции alembic до последней версии"""
     
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        await conn.commit()
+    command.upgrade(Config(BASE_DIR / "alembic.ini"), "head")
 
-if __name__ == "__main__":
-    asyncio.run(create_tables())
+
+def available_cpus() -> int:
+    """
+    Ядер, доступных процессу: с учётом привязки к ядрам и квоты cgroup v2
+    (--cpus контейнера), которую os.process_cpu_count() не видит
+    """
+    cpus = os.process_cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def serve() -> None:
+    """
+    Запускает uvicorn с настройками settings.server.
+
+    Миграции применяются один раз в главном процессе до запуска воркеров и
+    до создания event loop (env.py alembic сам вызывает asyncio.run).
+    Каждый воркер - отдельный процесс со своим пулом соединений, поэтому
+    к бд открывается до workers * (pool_size + max_overflow) соединений.
+    """
+    server = settings.server
+    if server.run_migrations:
+        run_migrations()
+        configure_logging()
+    workers = 1 if server.reload else (server.workers or available_cpus())
+    logger.info("Запуск: воркеров %s, loop %s, http %s", workers, server.loop, server.http)
     uvicorn.run(
         app="main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True    
-    )
\ No newline at end of file
+        host=server.host,
+        port=server.port,
+        workers=workers,
+        reload=server.reload,
+        loop=server.loop,
+        http=server.http,
+        timeout_keep_alive=server.timeout_keep_alive,
+        timeout_graceful_shutdown=server.timeout_graceful_shutdown,
+        access_log=server.access_log,
+    )
+
+
+if __name__ == "__main__":
+    serve()
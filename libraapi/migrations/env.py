@@ -0,0 +1,74 @@
+import asyncio
+from logging.config import fileConfig
+
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from alembic import context
+
+from database.db import Base
+from database.db import engine
+
+# Модели нужно импортировать, чтобы их таблицы попали в Base.metadata
+from database.models.book import BookModels
+from database.models.reader import ReaderModel
+from database.models.librarian import LibrarianModel
+from database.models.inventory import InventoryDataModel
+from database.models.circulation import CirculationMonthlyModel
+from database.models.circulation import CirculationBookModel
+from database.models.token import RefreshTokenModel
+
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    # Секции inventorydata создаются приложением, а не миграциями
+    return not (type_ == "table" and reflected and name.startswith("inventorydata_p"))
+
+
+def run_migrations_offline() -> None:
+    """Генерирует SQL миграций без подключения к бд (alembic upgrade --sql)"""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    """Применяет миграции через отдельное подключение без пула"""
+    connectable = create_async_engine(engine.url, poolclass=pool.NullPool)
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+def run_migrations_online() -> None:
+    asyncio.run(run_async_migrations())
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,69 @@
+"""initial
+
+Схема, которую раньше создавал Base.metadata.create_all.
+Для бд, созданной до появления миграций: alembic stamp 17d7603944a6
+
+Revision ID: 17d7603944a6
+Revises: 
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '17d7603944a6'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'books',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('author', sa.String(), nullable=False),
+        sa.Column('year_publication', sa.Integer(), nullable=True),
+        sa.Column('isnb', sa.String(), nullable=True),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('isnb'),
+    )
+    op.create_table(
+        'reader',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('fullname', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+    )
+    op.create_table(
+        'librarian',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+    )
+    op.create_table(
+        'inventorydata',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('reader_id', sa.Integer(), nullable=False),
+        sa.Column('date_of_issue', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('date_of_return', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('inventorydata')
+    op.drop_table('librarian')
+    op.drop_table('reader')
+    op.drop_table('books')
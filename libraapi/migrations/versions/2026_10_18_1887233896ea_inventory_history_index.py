@@ -0,0 +1,36 @@
+"""inventory history index
+
+Индекс для истории выдач читателя: курсорная пагинация по
+(date_of_issue, id) от новых к старым.
+
+Revision ID: 1887233896ea
+Revises: e5111b797cfa
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1887233896ea'
+down_revision: Union[str, Sequence[str], None] = 'e5111b797cfa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_inventorydata_reader_id_history', 'inventorydata',
+            ['reader_id', sa.text('date_of_issue DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventorydata_reader_id_history', table_name='inventorydata')
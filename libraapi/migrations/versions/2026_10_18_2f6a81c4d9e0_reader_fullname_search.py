@@ -0,0 +1,36 @@
+"""reader fullname search
+
+Триграммный GIN индекс по ФИО читателя для GET /reader/search. Расширение
+pg_trgm создано миграцией поиска книг. Индекс строится CONCURRENTLY.
+
+Revision ID: 2f6a81c4d9e0
+Revises: 7d4b0e93f215
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6a81c4d9e0'
+down_revision: Union[str, Sequence[str], None] = '7d4b0e93f215'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_reader_fullname_trgm', 'reader', ['fullname'],
+            postgresql_using='gin', postgresql_ops={'fullname': 'gin_trgm_ops'},
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reader_fullname_trgm', table_name='reader')
@@ -0,0 +1,143 @@
+"""inventory partitioning
+
+Переводит inventorydata на секционирование по месяцам date_of_issue.
+
+Таблица пересоздаётся: данные копируются в новую секционированную таблицу
+под блокировкой записи, поэтому миграцию нужно применять в окно
+обслуживания. Секции создаются на все месяцы с данными и на
+3 месяца вперёд, дальше их досоздаёт приложение
+(utils/partitions.py).
+
+Первичный ключ становится (id, date_of_issue): ключ секционирования обязан
+в него входить. Внешние ключи на секционированной таблице нельзя создать
+NOT VALID, поэтому выдачи, ссылающиеся на удалённые книги или читателей
+(старая история, ради которой ключи были NOT VALID), переносятся в
+archive.inventorydata_orphans и в новую таблицу не попадают. Данные не
+теряются, а миграция, которую приложение применяет при старте, не
+останавливается. downgrade их не возвращает: обычные внешние ключи
+старой таблицы с ними тоже не создались бы.
+
+Revision ID: 5b2e9d41c7a3
+Revises: cf7985765abf
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from alembic import context
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9d41c7a3'
+down_revision: Union[str, Sequence[str], None] = 'cf7985765abf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+ORPHANS_TABLE = "archive.inventorydata_orphans"
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_indexes() -> None:
+    op.create_foreign_key('inventorydata_book_id_fkey', 'inventorydata', 'books', ['book_id'], ['id'])
+    op.create_foreign_key('inventorydata_reader_id_fkey', 'inventorydata', 'reader', ['reader_id'], ['id'])
+    op.create_index(
+        'ix_inventorydata_reader_id_open', 'inventorydata', ['reader_id'],
+        postgresql_where=sa.text('date_of_return IS NULL'),
+    )
+    op.create_index('ix_inventorydata_book_id', 'inventorydata', ['book_id'])
+    op.create_index(
+        'ix_inventorydata_date_of_issue_open', 'inventorydata', ['date_of_issue'],
+        postgresql_where=sa.text('date_of_return IS NULL'),
+    )
+    op.create_index(
+        'ix_inventorydata_reader_id_history', 'inventorydata',
+        ['reader_id', sa.text('date_of_issue DESC'), sa.text('id DESC')],
+    )
+
+
+def replace_table(primary_key: list[str]) -> None:
+    """Копирует inventorydata в уже созданную inventorydata_new и подменяет ею старую"""
+    op.execute(
+        "INSERT INTO inventorydata_new (id, book_id, reader_id, date_of_issue, date_of_return) "
+        "SELECT id, book_id, reader_id, date_of_issue, date_of_return FROM inventorydata"
+    )
+    # Последовательность id переходит к новой таблице, а не удаляется со старой
+    op.execute("ALTER SEQUENCE inventorydata_id_seq OWNED BY NONE")
+    op.drop_table('inventorydata')
+    op.rename_table('inventorydata_new', 'inventorydata')
+    op.execute("ALTER SEQUENCE inventorydata_id_seq OWNED BY inventorydata.id")
+    op.create_primary_key('inventorydata_pkey', 'inventorydata', primary_key)
+    create_indexes()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    op.execute("LOCK TABLE inventorydata IN EXCLUSIVE MODE")
+
+    op.execute("CREATE SCHEMA IF NOT EXISTS archive")
+    op.execute(f"CREATE TABLE IF NOT EXISTS {ORPHANS_TABLE} (LIKE inventorydata)")
+    orphans = bind.execute(sa.text(
+        "WITH orphans AS ("
+        "DELETE FROM inventorydata "
+        "WHERE NOT EXISTS (SELECT 1 FROM books WHERE books.id = inventorydata.book_id) "
+        "OR NOT EXISTS (SELECT 1 FROM reader WHERE reader.id = inventorydata.reader_id) "
+        "RETURNING *"
+        f") INSERT INTO {ORPHANS_TABLE} SELECT * FROM orphans"
+    )).rowcount
+    if orphans:
+        context.config.print_stdout(
+            "В %s перенесено %s выдач, ссылающихся на удалённые книги или читателей",
+            ORPHANS_TABLE, orphans
+        )
+
+    op.execute(
+        "CREATE TABLE inventorydata_new ("
+        "id integer NOT NULL DEFAULT nextval('inventorydata_id_seq'), "
+        "book_id integer NOT NULL, "
+        "reader_id integer NOT NULL, "
+        "date_of_issue timestamp without time zone NOT NULL DEFAULT now(), "
+        "date_of_return timestamp without time zone"
+        ") PARTITION BY RANGE (date_of_issue)"
+    )
+
+    current = date.today().replace(day=1)
+    bounds = bind.execute(sa.text(
+        "SELECT CAST(date_trunc('month', min(date_of_issue)) AS date), "
+        "CAST(date_trunc('month', max(date_of_issue)) AS date) FROM inventorydata"
+    )).one()
+    month = min(bounds[0] or current, current)
+    last = max(bounds[1] or current, add_months(current, MONTHS_AHEAD))
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE inventorydata_p{month:%Y%m} PARTITION OF inventorydata_new "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        )
+        month = add_months(month, 1)
+
+    replace_table(primary_key=['id', 'date_of_issue'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("LOCK TABLE inventorydata IN EXCLUSIVE MODE")
+    op.execute(
+        "CREATE TABLE inventorydata_new ("
+        "id integer NOT NULL DEFAULT nextval('inventorydata_id_seq'), "
+        "book_id integer NOT NULL, "
+        "reader_id integer NOT NULL, "
+        "date_of_issue timestamp without time zone NOT NULL DEFAULT now(), "
+        "date_of_return timestamp without time zone"
+        ")"
+    )
+    # Секции, отключённые архивацией, остаются в схеме архива и не возвращаются
+    replace_table(primary_key=['id'])
@@ -0,0 +1,48 @@
+"""reader email lower
+
+Уникальность email читателя без учёта регистра: уникальное ограничение
+на email заменяется уникальным индексом по lower(email), по которому
+идёт поиск читателя. Индекс строится CONCURRENTLY. Если в таблице уже есть
+email, отличающиеся только регистром, миграция останавливается с ошибкой.
+
+Revision ID: 7d4b0e93f215
+Revises: a3c8f1e260d4
+Create Date: 2026-10-18 13:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4b0e93f215'
+down_revision: Union[str, Sequence[str], None] = 'a3c8f1e260d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT lower(email) FROM reader GROUP BY lower(email) HAVING count(*) > 1 LIMIT 10"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            "Email читателей совпадают без учёта регистра, объедините их перед миграцией: "
+            + ", ".join(duplicates)
+        )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_reader_email_lower', 'reader', [sa.text('lower(email)')],
+            unique=True, postgresql_concurrently=True, if_not_exists=True,
+        )
+    op.drop_constraint('reader_email_key', 'reader', type_='unique')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_unique_constraint('reader_email_key', 'reader', ['email'])
+    op.drop_index('uq_reader_email_lower', table_name='reader')
@@ -0,0 +1,43 @@
+"""refresh tokens
+
+Таблица выданных refresh токенов для /librarian/refresh/: поиск токена по
+первичному ключу jti, отзыв семейства токенов по индексу family.
+
+Revision ID: 9e1c5a7b3f28
+Revises: 2f6a81c4d9e0
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e1c5a7b3f28'
+down_revision: Union[str, Sequence[str], None] = '2f6a81c4d9e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'refresh_tokens',
+        sa.Column('jti', sa.String(length=32), nullable=False),
+        sa.Column('family', sa.String(length=32), nullable=False),
+        sa.Column('librarian_id', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('used_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['librarian_id'], ['librarian.id']),
+        sa.PrimaryKeyConstraint('jti'),
+    )
+    op.create_index('ix_refresh_tokens_family', 'refresh_tokens', ['family'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_refresh_tokens_family', table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
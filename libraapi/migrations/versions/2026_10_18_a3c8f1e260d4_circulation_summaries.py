@@ -0,0 +1,71 @@
+"""circulation summaries
+
+Сводные таблицы для аналитики выдач: circulation_monthly (выдачи и
+возвраты книги по месяцам) и circulation_books (итоги по книге).
+Дальше их обновляют выдача и возврат (utils/circulation.py), здесь они
+один раз заполняются по истории inventorydata. Запись в inventorydata на
+время заполнения блокируется, чтобы выдачи не потерялись между
+заполнением и выкладкой нового кода.
+
+Revision ID: a3c8f1e260d4
+Revises: 5b2e9d41c7a3
+Create Date: 2026-10-18 13:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c8f1e260d4'
+down_revision: Union[str, Sequence[str], None] = '5b2e9d41c7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'circulation_monthly',
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('issued', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('returned', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id']),
+        sa.PrimaryKeyConstraint('book_id', 'month'),
+    )
+    op.create_index('ix_circulation_monthly_month', 'circulation_monthly', ['month'])
+    op.create_table(
+        'circulation_books',
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('issued', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('on_loan', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id']),
+        sa.PrimaryKeyConstraint('book_id'),
+    )
+
+    op.execute("LOCK TABLE inventorydata IN SHARE MODE")
+    op.execute(
+        "INSERT INTO circulation_monthly (book_id, month, issued, returned) "
+        "SELECT book_id, month, sum(issued), sum(returned) FROM ("
+        "SELECT book_id, CAST(date_trunc('month', date_of_issue) AS date) AS month, 1 AS issued, 0 AS returned "
+        "FROM inventorydata "
+        "UNION ALL "
+        "SELECT book_id, CAST(date_trunc('month', date_of_return) AS date), 0, 1 "
+        "FROM inventorydata WHERE date_of_return IS NOT NULL"
+        ") AS events GROUP BY book_id, month"
+    )
+    op.execute(
+        "INSERT INTO circulation_books (book_id, issued, on_loan) "
+        "SELECT book_id, count(*), count(*) FILTER (WHERE date_of_return IS NULL) "
+        "FROM inventorydata GROUP BY book_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('circulation_books')
+    op.drop_index('ix_circulation_monthly_month', table_name='circulation_monthly')
+    op.drop_table('circulation_monthly')
@@ -0,0 +1,35 @@
+"""inventory overdue index
+
+Частичный индекс открытых выдач по дате выдачи для отчёта о просрочках.
+
+Revision ID: cf7985765abf
+Revises: 1887233896ea
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cf7985765abf'
+down_revision: Union[str, Sequence[str], None] = '1887233896ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_inventorydata_date_of_issue_open', 'inventorydata', ['date_of_issue'],
+            postgresql_where=sa.text('date_of_return IS NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventorydata_date_of_issue_open', table_name='inventorydata')
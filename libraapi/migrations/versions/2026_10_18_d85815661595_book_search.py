@@ -0,0 +1,58 @@
+"""book search
+
+Полнотекстовый и триграммный поиск по названию и автору книги.
+
+Бд, созданная create_all до появления миграций и помеченная
+alembic stamp 17d7603944a6, может уже иметь search_vector и индексы
+(если create_all создавал её после добавления поиска), а может не
+иметь. Поэтому колонка и индексы создаются только если их ещё нет.
+
+Revision ID: d85815661595
+Revises: 17d7603944a6
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd85815661595'
+down_revision: Union[str, Sequence[str], None] = '17d7603944a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        'books',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('russian', name || ' ' || author)", persisted=True),
+            nullable=True,
+        ),
+        if_not_exists=True,
+    )
+    op.create_index('ix_books_search_vector', 'books', ['search_vector'], postgresql_using='gin', if_not_exists=True)
+    op.create_index(
+        'ix_books_name_trgm', 'books', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}, if_not_exists=True,
+    )
+    op.create_index(
+        'ix_books_author_trgm', 'books', ['author'],
+        postgresql_using='gin', postgresql_ops={'author': 'gin_trgm_ops'}, if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_author_trgm', table_name='books')
+    op.drop_index('ix_books_name_trgm', table_name='books')
+    op.drop_index('ix_books_search_vector', table_name='books')
+    op.drop_column('books', 'search_vector')
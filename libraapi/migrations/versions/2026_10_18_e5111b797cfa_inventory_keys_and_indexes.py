@@ -0,0 +1,57 @@
+"""inventory keys and indexes
+
+Внешние ключи inventorydata на books и reader, частичный индекс открытых
+выдач по читателю и индекс по book_id.
+
+Ключи создаются NOT VALID: новые строки проверяются сразу, а история
+выдач, в которой могут остаться ссылки на удалённые ранее книги и
+читателей, не блокирует миграцию. Индексы строятся CONCURRENTLY, чтобы
+не останавливать выдачу книг на больших таблицах.
+
+Revision ID: e5111b797cfa
+Revises: d85815661595
+Create Date: 2026-10-18 12:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5111b797cfa'
+down_revision: Union[str, Sequence[str], None] = 'd85815661595'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_foreign_key(
+        'inventorydata_book_id_fkey', 'inventorydata', 'books',
+        ['book_id'], ['id'], postgresql_not_valid=True,
+    )
+    op.create_foreign_key(
+        'inventorydata_reader_id_fkey', 'inventorydata', 'reader',
+        ['reader_id'], ['id'], postgresql_not_valid=True,
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_inventorydata_reader_id_open', 'inventorydata', ['reader_id'],
+            postgresql_where=sa.text('date_of_return IS NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_inventorydata_book_id', 'inventorydata', ['book_id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventorydata_book_id', table_name='inventorydata')
+    op.drop_index('ix_inventorydata_reader_id_open', table_name='inventorydata')
+    op.drop_constraint('inventorydata_reader_id_fkey', 'inventorydata', type_='foreignkey')
+    op.drop_constraint('inventorydata_book_id_fkey', 'inventorydata', type_='foreignkey')
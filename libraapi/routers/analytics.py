@@ -0,0 +1,201 @@
+from datetime import date
+
+from fastapi import APIRouter
+from fastapi import status
+from fastapi import Depends
+from fastapi import Query
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+
+from sqlalchemy import select
+from sqlalchemy import func
+from sqlalchemy import cast
+from sqlalchemy import Float
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models.book import BookModels
+from database.models.circulation import CirculationMonthlyModel
+from database.models.circulation import CirculationBookModel
+
+from dependencies.db import async_get_db
+from utils.validate import get_current_user
+from utils.partitions import add_months
+
+
+router = APIRouter()
+
+
+def window_start(months: int) -> date:
+    """Первый день окна из months последних месяцев, включая текущий"""
+    return add_months(date.today().replace(day=1), 1 - months)
+
+
+@router.get("/analytics/top-books")
+async def get_top_books(
+        months: int = Query(12, gt=0, le=120),
+        limit: int = Query(10, gt=0, le=100),
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Получает самые выдаваемые книги за последние месяцы.
+
+    Считается по сводке circulation_monthly, а не по истории выдач, поэтому
+    время ответа зависит от числа книг и месяцев, а не выдач.
+
+    Параметры:
+        months: int - окно в месяцах, включая текущий (по умолчанию 12)
+        limit: int - количество книг (по умолчанию 10)
+
+    Возвращает:
+        json:
+        - books (list): id, name, author, issued - от самых выдаваемых
+
+    Ошибки:
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    try:
+        issued = func.sum(CirculationMonthlyModel.issued).label("issued")
+        stmt = select(BookModels.id, BookModels.name, BookModels.author, issued)\
+                .join(BookModels, BookModels.id == CirculationMonthlyModel.book_id)\
+                .where(CirculationMonthlyModel.month >= window_start(months))\
+                .group_by(BookModels.id)\
+                .having(issued > 0)\
+                .order_by(issued.desc(), BookModels.id)\
+                .limit(limit)
+        result = await db.execute(statement=stmt)
+
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "books": [row._asdict() for row in result]
+            }
+        )
+    except Exception as error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Неизвестная ошибка: {error}"
+        )
+
+
+@router.get("/analytics/authors")
+async def get_author_circulation(
+        months: int = Query(12, gt=0, le=120),
+        limit: int = Query(10, gt=0, le=100),
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Получает выдачи по авторам за последние месяцы.
+
+    Параметры:
+        months: int - окно в месяцах, включая текущий (по умолчанию 12)
+        limit: int - количество авторов (по умолчанию 10)
+
+    Возвращает:
+        json:
+        - authors (list): от самых выдаваемых:
+            - author (str)
+            - issued (int): выдачи за окно
+            - returned (int): возвраты за окно
+            - books (int): сколько книг автора выдавалось
+
+    Ошибки:
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    try:
+        issued = func.sum(CirculationMonthlyModel.issued).label("issued")
+        stmt = select(
+                    BookModels.author,
+                    issued,
+                    func.sum(CirculationMonthlyModel.returned).label("returned"),
+                    func.count(func.distinct(CirculationMonthlyModel.book_id)).label("books"),
+                )\
+                .join(BookModels, BookModels.id == CirculationMonthlyModel.book_id)\
+                .where(CirculationMonthlyModel.month >= window_start(months))\
+                .group_by(BookModels.author)\
+                .order_by(issued.desc(), BookModels.author)\
+                .limit(limit)
+        result = await db.execute(statement=stmt)
+
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "authors": [row._asdict() for row in result]
+            }
+        )
+    except Exception as error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Неизвестная ошибка: {error}"
+        )
+
+
+@router.get("/analytics/utilisation")
+async def get_utilisation(
+        limit: int = Query(10, gt=0, le=100),
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Получает загрузку фонда: какая доля экземпляров сейчас на руках.
+
+    На руках - открытые выдачи из сводки circulation_books, на полке -
+    остаток books.amount.
+
+    Параметры:
+        limit: int - количество самых загруженных книг (по умолчанию 10)
+
+    Возвращает:
+        json:
+        - on_loan (int): экземпляров на руках
+        - in_stock (int): экземпляров на полке
+        - utilisation (float): on_loan / (on_loan + in_stock)
+        - books (list): id, name, author, on_loan, in_stock, utilisation -
+          самые загруженные книги
+
+    Ошибки:
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    try:
+        on_loan = func.coalesce(CirculationBookModel.on_loan, 0)
+        stmt_total = select(
+                        func.coalesce(func.sum(on_loan), 0).label("on_loan"),
+                        func.coalesce(func.sum(BookModels.amount), 0).label("in_stock"),
+                    )\
+                    .select_from(BookModels)\
+                    .outerjoin(CirculationBookModel, CirculationBookModel.book_id == BookModels.id)
+        total = (await db.execute(statement=stmt_total)).one()._asdict()
+        copies = total["on_loan"] + total["in_stock"]
+        total["utilisation"] = total["on_loan"] / copies if copies else 0.0
+
+        utilisation = (
+            cast(CirculationBookModel.on_loan, Float)
+            / (CirculationBookModel.on_loan + BookModels.amount)
+        ).label("utilisation")
+        stmt_books = select(
+                        BookModels.id,
+                        BookModels.name,
+                        BookModels.author,
+                        CirculationBookModel.on_loan,
+                        BookModels.amount.label("in_stock"),
+                        utilisation,
+                    )\
+                    .join(BookModels, BookModels.id == CirculationBookModel.book_id)\
+                    .where(CirculationBookModel.on_loan > 0)\
+                    .order_by(utilisation.desc(), CirculationBookModel.on_loan.desc(), BookModels.id)\
+                    .limit(limit)
+        result = await db.execute(statement=stmt_books)
+
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                **total,
+                "books": [row._asdict() for row in result]
+            }
+        )
+    except Exception as error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Неизвестная ошибка: {error}"
+        )
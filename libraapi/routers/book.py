@@ -1,30 +1,74 @@
+import asyncio
+
+from typing import Optional
+
+import orjson
+
 from fastapi import APIRouter
 from fastapi import status
 from fastapi import Depends
 from fastapi import Path
+from fastapi import Query
 from fastapi import HTTPException
+from fastapi import Request
+from fastapi import Header
+from fastapi import Response
 from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from fastapi.responses import StreamingResponse
 
-from sqlalchemy import insert
-from sqlalchemy import select
-from sqlalchemy import delete
-from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from database.schemas.book import AddBookSchemas
-from database.schemas.book import GetBookSchemas
 from database.schemas.book import UpdateBookSchemas
 
 from database.models.book import BookModels
+from database.repositories import book as book_repository
 
+from core.config import settings
 from dependencies.db import async_get_db
 from utils.validate import get_current_user
+from utils.pagination import encode_cursor
+from utils.pagination import decode_cursor
+from utils.cache import book_cache
+from utils.catalog import catalog
+from utils.replica import replica_state
+from utils.events import change_bus
+from utils.events import book_event
+from utils.bulk import get_upload_format
+from utils.bulk import iter_records
+from utils.bulk import validate_record
+from utils.bulk import copy_upsert
 
 
 router = APIRouter()
 
 
+def conditional_response(body: bytes, etag: Optional[str], if_none_match: Optional[str]) -> Response:
+    """
+    Ответ json с готовым телом body.
+
+    Если etag есть в If-None-Match, вместо тела возвращается 304.
+    etag None - ответ без ETag (данные с отстающей реплики).
+    """
+    if etag is None:
+        return Response(content=body, media_type="application/json")
+    if catalog.matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def encode_book(book: dict) -> tuple[dict, bytes, str]:
+    """
+    Запись кэша карточек: (книга, тело ответа GET /book/{book_id}, ETag).
+
+    Книга нужна GET /book/batch, который собирает ответ из нескольких карточек
+    """
+    body = orjson.dumps({"book": book})
+    return book, body, catalog.etag(body)
+
+
 @router.post("/book/")
 async def add_book(
     schema: AddBookSchemas, 
@@ -61,17 +105,18 @@ async def add_book(
     }
     
     """
+    if schema.amount < 0:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Кол-во книг не может быть меньше нуля"
+        )
+
     try:
-        stmt = insert(BookModels).values(schema.model_dump())
-        await db.execute(statement=stmt)
+        book_id = await book_repository.add_book(db, schema.model_dump())
+        await change_bus.publish(db, book_event("create", book_id, schema.amount))
         await db.commit()
+        catalog.touch(book_id)
 
-        if schema.amount < 0:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Кол-во книг не может быть меньше нуля"
-            )
-        
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={
@@ -89,57 +134,406 @@ async def add_book(
             detail=f"Неизвестная ошибка: {error}"
         )
 
+@router.post("/book/bulk")
+async def add_books_bulk(
+        request: Request,
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Массово загружает книги из CSV или NDJSON файла.
+
+    Тело запроса читается потоком и обрабатывается пачками по settings.bulk.chunk_size
+    строк: каждая строка проверяется по схеме AddBookSchemas, валидные строки
+    грузятся через COPY и переносятся в каталог upsert-ом по isnb. Если книга
+    с таким ISBN уже есть (или встречается в файле раньше), её данные
+    перезаписываются. Вся загрузка выполняется одной транзакцией.
+
+    Параметры:
+        Тело запроса с Content-Type:
+        - text/csv: первая строка - заголовок name,author,year_publication,isnb,amount
+        - application/x-ndjson: по одному json объекту на строку
+
+    Возвращает:
+        json:
+        - inserted (int): сколько книг добавлено
+        - updated (int): сколько книг обновлено
+        - rejected (int): сколько строк отклонено
+        - errors (list): первые settings.bulk.max_errors ошибок вида {"row": номер строки, "errors": [...]}
+
+    Ошибки:
+        HTTPException: 415 если формат файла не поддерживается
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    upload_format = get_upload_format(request)
+    columns = ["name", "author", "year_publication", "isnb", "amount"]
+    report = {"inserted": 0, "updated": 0, "rejected": 0, "errors": []}
+
+    def reject(row: int, errors: list):
+        report["rejected"] += 1
+        if len(report["errors"]) < settings.bulk.max_errors:
+            report["errors"].append({"row": row, "errors": errors})
+
+    async def flush(chunk: dict):
+        inserted, updated = await copy_upsert(
+            db=db,
+            table=BookModels.__tablename__,
+            columns=columns,
+            records=list(chunk.values()),
+            conflict="(isnb)",
+            update_columns=["name", "author", "year_publication", "amount"],
+        )
+        report["inserted"] += inserted
+        report["updated"] += updated
+
+    try:
+        # Ключ - isnb, чтобы повтор ISBN внутри пачки не ломал upsert
+        chunk = {}
+        async for row, record in iter_records(request, upload_format):
+            book = validate_record(record, AddBookSchemas)
+            if isinstance(book, list):
+                reject(row, book)
+                continue
+            if book.amount is not None and book.amount < 0:
+                reject(row, [{"loc": ["amount"], "msg": "Кол-во книг не может быть меньше нуля"}])
+                continue
+
+            key = book.isnb if book.isnb is not None else ("row", row)
+            chunk.pop(key, None)
+            chunk[key] = (book.name, book.author, book.year_publication, book.isnb, book.amount or 0)
+
+            if len(chunk) >= settings.bulk.chunk_size:
+                await flush(chunk)
+                chunk = {}
+
+        if chunk:
+            await flush(chunk)
+        await change_bus.publish(db, book_event("create"))
+        await db.commit()
+        catalog.touch()
+
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content=report
+        )
+    except Exception as error:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Неизвестная ошибка: {error}"
+        )
+
+
 @router.get("/book/")
-async def get_books(db: AsyncSession = Depends(async_get_db)):
+async def get_books(
+        limit: int = Query(settings.pagination.default_limit, gt=0, le=settings.pagination.max_limit),
+        cursor: Optional[str] = Query(None),
+        if_none_match: Optional[str] = Header(None),
+        db: AsyncSession = Depends(async_get_db)
+    ):
     """
-    Получает список всех книг из базы данных.
+    Получает страницу каталога книг, отсортированного по id.
+
+    Пагинация курсорная (keyset по id): следующая страница выбирается
+    условием id > последнего id, поэтому время ответа не зависит от
+    того, насколько далеко клиент пролистал каталог.
+
+    Ответ содержит ETag по содержимому страницы, на совпадающий
+    If-None-Match возвращается 304. Тело страницы кэшируется уже
+    закодированным вместе с ETag и пересобирается только после записи
+    в каталог, так что повторный запрос страницы в бд не ходит.
 
     Параметры:
-        -
+        limit: int - размер страницы (не больше settings.pagination.max_limit)
+        cursor: str, optional - next_cursor из предыдущего ответа
 
     Возвращает:
-        Ответ в формате JSON, содержащий список книг:
-        - books (list): Список всех книг с полной информацией о каждой:
+        Ответ в формате JSON, содержащий страницу книг:
+        - books (list): Список книг с полной информацией о каждой:
             - id (int): Уникальный идентификатор книги
             - name (str): Название книги
             - author (str): Автор книги
             - year_publication (int, optional): Год публикации
             - isnb (str, optional): Международный стандартный номер книги
             - amount (int): Количество доступных экземпляров
+        - next_cursor (str | None): курсор следующей страницы, None если страница последняя
 
     Ошибки:
+        HTTPException: 400 ошибка если курсор некорректен
         HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
     """
+    snapshot_key = (cursor, limit)
+    snapshot = catalog.get_snapshot(snapshot_key)
+    if snapshot is not None:
+        return conditional_response(*snapshot, if_none_match)
+
+    after_id = 0
+    if cursor is not None:
+        after_id, = decode_cursor(cursor, size=1)
+        if not isinstance(after_id, int):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некорректный курсор"
+            )
+
     try:
-        stmt = select(BookModels)
-        books = await db.execute(statement=stmt)
-        rows = books.scalars().all()
-        books_list = [
-            GetBookSchemas.model_validate(row).model_dump() for row in rows
-        ]
-            
-        return JSONResponse(
+        version = catalog.value
+
+        # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+        books_list = await book_repository.get_books_page(db, after_id=after_id, limit=limit)
+
+        next_cursor = None
+        if len(books_list) > limit:
+            books_list.pop()
+            next_cursor = encode_cursor(books_list[-1]["id"])
+
+        # Страница с реплики сразу после изменения каталога может быть
+        # устаревшей: её не кэшируем и не отдаём с ETag
+        body = orjson.dumps({
+            "books": books_list,
+            "next_cursor": next_cursor
+        })
+        etag = None
+        if replica_state.fresh(db):
+            etag = catalog.etag(body)
+            catalog.set_snapshot(snapshot_key, body, etag, version)
+        return conditional_response(body, etag, if_none_match)
+        
+    except Exception as error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Неизвестная ошибка: {error}"
+        )
+
+
+@router.get("/book/search")
+async def search_books(
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(settings.pagination.default_limit, gt=0, le=settings.pagination.max_limit),
+        cursor: Optional[str] = Query(None),
+        db: AsyncSession = Depends(async_get_db)
+    ):
+    """
+    Ищет книги по названию и автору с ранжированием результатов.
+
+    Сначала выполняется полнотекстовый поиск по search_vector (GIN индекс).
+    Если он ничего не нашёл, используется триграммный поиск по name/author
+    (pg_trgm), который находит книги и при опечатках в запросе. Выдача
+    отсортирована по релевантности, пагинация курсорная по (rank, id).
+
+    Параметры:
+        q: str - поисковый запрос
+        limit: int - размер страницы (не больше settings.pagination.max_limit)
+        cursor: str, optional - next_cursor из предыдущего ответа
+
+    Возвращает:
+        json:
+        - books (list): найденные книги, каждая дополнительно содержит rank (float)
+        - next_cursor (str | None): курсор следующей страницы, None если страница последняя
+
+    Ошибки:
+        HTTPException: 400 ошибка если курсор некорректен
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    mode, after = "fulltext", None
+    if cursor is not None:
+        mode, last_rank, last_id = decode_cursor(cursor, size=3)
+        if mode not in ("fulltext", "trigram") or not isinstance(last_id, int) \
+                or not isinstance(last_rank, (int, float)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некорректный курсор"
+            )
+        after = (last_rank, last_id)
+
+    try:
+        rows = await book_repository.search_books(db, mode=mode, q=q, limit=limit, after=after)
+
+        # Полнотекстовый поиск ничего не дал - пробуем найти с учётом опечаток
+        if not rows and cursor is None:
+            mode = "trigram"
+            rows = await book_repository.search_books(db, mode=mode, q=q, limit=limit)
+
+        books_list = rows[:limit]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = books_list[-1]
+            next_cursor = encode_cursor(mode, last["rank"], last["id"])
+
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
-                "books": books_list
+                "books": books_list,
+                "next_cursor": next_cursor
             }
         )
-        
     except Exception as error:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Неизвестная ошибка: {error}"
         )
-        
-        
+
+
+@router.get("/book/batch")
+async def get_books_batch(
+        ids: str = Query(..., description="id книг через запятую"),
+        if_none_match: Optional[str] = Header(None),
+        db: AsyncSession = Depends(async_get_db)
+    ):
+    """
+    Получает несколько книг по списку id за один запрос.
+
+    Книги сначала берутся из кэша карточек, недостающие выбираются из бд
+    одним запросом WHERE id = ANY(...). Порядок ответа совпадает с порядком
+    id в запросе. Ответ содержит ETag по содержимому, как и GET /book/{book_id}.
+    Закодированный ответ кэшируется вместе с ETag до следующей записи
+    в каталог, так что повторный запрос того же списка id сразу
+    сверяется с If-None-Match.
+
+    Параметры:
+        ids: str - id книг через запятую, не больше settings.pagination.max_batch, например 1,5,7
+
+    Возвращает:
+        json:
+        - books (list): элементы в порядке запроса:
+            - id (int): запрошенный id
+            - book (dict | None): карточка книги, None если книга не найдена
+
+    Ошибки:
+        HTTPException: 400 ошибка если ids не список целых чисел или их слишком много
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    try:
+        book_ids = [int(book_id) for book_id in ids.split(",") if book_id.strip()]
+    except ValueError:
+        book_ids = []
+    if not book_ids or len(book_ids) > settings.pagination.max_batch or min(book_ids) <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"ids должен содержать от 1 до {settings.pagination.max_batch} положительных целых чисел"
+        )
+
+    snapshot_key = ("batch", tuple(book_ids))
+    snapshot = catalog.get_snapshot(snapshot_key)
+    if snapshot is not None:
+        return conditional_response(*snapshot, if_none_match)
+
+    try:
+        version = catalog.value
+        found = {}
+        missing = []
+        for book_id in dict.fromkeys(book_ids):
+            cached = book_cache.get(book_id)
+            if cached is None:
+                missing.append(book_id)
+            else:
+                found[book_id] = cached[0]
+
+        fresh = True
+        if missing:
+            books = await book_repository.get_books_by_ids(db, missing)
+            fresh = replica_state.fresh(db)
+            for book in books:
+                found[book["id"]] = book
+                if fresh and version == catalog.value:
+                    book_cache.set(book["id"], encode_book(book))
+
+        body = orjson.dumps({
+            "books": [
+                {"id": book_id, "book": found.get(book_id)} for book_id in book_ids
+            ]
+        })
+        etag = None
+        if fresh:
+            etag = catalog.etag(body)
+            catalog.set_snapshot(snapshot_key, body, etag, version)
+        return conditional_response(body, etag, if_none_match)
+    except Exception as error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Неизвестная ошибка: {error}"
+        )
+
+
+@router.get("/book/changes")
+async def stream_book_changes(
+        ids: Optional[str] = Query(None, description="id книг через запятую, по умолчанию все книги")
+    ):
+    """
+    Поток изменений каталога в формате Server-Sent Events.
+
+    Заменяет частый опрос GET /book/{book_id}: клиент держит одно
+    подключение и получает событие после каждой выдачи, возврата,
+    изменения, добавления или удаления книги. События приходят из
+    Postgres NOTIFY, поэтому видны изменения, сделанные любым процессом.
+    Раз в settings.events.keepalive секунд отправляется комментарий, чтобы
+    прокси не закрывали простаивающее подключение.
+
+    Параметры:
+        ids: str, optional - id книг через запятую, не больше settings.pagination.max_batch
+
+    Возвращает:
+        text/event-stream, события change с data:
+        - event (str): create, update, delete, issue, return или resync
+        - book_id (int | None): id книги, None если изменились многие книги
+        - amount (int | None): остаток после изменения, если известен
+
+        resync означает, что события могли быть потеряны и состояние
+        нужно перечитать целиком.
+
+    Ошибки:
+        HTTPException: 400 ошибка если ids не список целых чисел или их слишком много
+    """
+    book_ids = None
+    if ids is not None:
+        try:
+            book_ids = {int(book_id) for book_id in ids.split(",") if book_id.strip()}
+        except ValueError:
+            book_ids = set()
+        if not book_ids or len(book_ids) > settings.pagination.max_batch or min(book_ids) <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"ids должен содержать от 1 до {settings.pagination.max_batch} положительных целых чисел"
+            )
+
+    async def events():
+        async with change_bus.subscribe() as queue:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.events.keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if book_ids is not None and event.get("book_id") is not None and event["book_id"] not in book_ids:
+                    continue
+                yield b"event: change\ndata: " + orjson.dumps(event) + b"\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @router.get("/book/{book_id}")
 async def get_book_by_id(
         book_id: int = Path(..., gt=0),
+        if_none_match: Optional[str] = Header(None),
         db: AsyncSession = Depends(async_get_db)
     ):
     """
     Получает информацию о книге из бд по id.
 
+    Ответ содержит ETag по содержимому карточки, на совпадающий
+    If-None-Match возвращается 304. Карточка кэшируется в процессе уже
+    закодированной вместе с ETag, поэтому при попадании в кэш ответ
+    (или 304) отдаётся без обращения к бд и без сериализации.
+
     Параметры:
         book_id: int, больше 0
 
@@ -157,26 +551,33 @@ async def get_book_by_id(
         HTTPException: 404 ошибка если книга с таким id не найдена
         HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
     """
-    
+    cached = book_cache.get(book_id)
+    if cached is not None:
+        _, body, etag = cached
+        return conditional_response(body, etag, if_none_match)
+
     try:
-        stmt = select(BookModels).where(BookModels.id == book_id).execution_options(expire_on_commit=False)
-        result = await db.execute(statement=stmt)
-        book = result.scalar_one_or_none()
-        
-        if book is None:
+        version = catalog.value
+        result = await book_repository.get_book(db, book_id)
+
+        if result is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Книга не найдена"
             )
-            
-        result = GetBookSchemas.model_validate(book).model_dump()
-        
-        return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={
-                "book": result
-            }
-        )
+
+        # Карточку с отстающей реплики не кэшируем и не отдаём с ETag
+        if not replica_state.fresh(db):
+            return conditional_response(orjson.dumps({"book": result}), None, if_none_match)
+
+        cached = encode_book(result)
+        # Если пока шёл запрос книгу изменили, в кэш её не кладём
+        if version == catalog.value:
+            book_cache.set(book_id, cached)
+        _, body, etag = cached
+        return conditional_response(body, etag, if_none_match)
+    except HTTPException:
+        raise
     except Exception as error:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -201,27 +602,36 @@ async def delete_book(
 
     Ошибки:
         HTTPException: 404 ошибка если книга с таким id не найдена
+        HTTPException: 409 ошибка если по книге есть история выдач
         HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
     """
     
     try:
-        stmt = delete(BookModels).where(BookModels.id == book_id).returning(BookModels)
-        result_delete_book = await db.execute(statement=stmt)
+        is_deleted = await book_repository.delete_book(db, book_id)
         
         
-        if result_delete_book.scalar_one_or_none() is None:
+        if not is_deleted:
             raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail=f"Книга не найдена"
                 )
             
+        await change_bus.publish(db, book_event("delete", book_id))
         await db.commit()
+        catalog.touch(book_id)
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "delete": "successfully"
             }
         )
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Книгу нельзя удалить: по ней есть история выдач"
+        )
+    except HTTPException:
+        raise
     except Exception as error:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -257,24 +667,22 @@ async def update_book(
     
     
     try:
-        stmt_get_book = select(BookModels).where(BookModels.id == book_id).execution_options(expire_on_commit=False)
-        result = await db.execute(statement=stmt_get_book)
-        book = result.scalar_one_or_none()
-        if book is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Книга не найдена"
-            )
-        
         if schema.amount < 0:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Кол-во книг не может быть меньше нуля"
             )
         
-        stmt = update(BookModels).where(BookModels.id == book_id).values(schema.model_dump())
-        await db.execute(statement=stmt)
+        is_updated = await book_repository.update_book(db, book_id, schema.model_dump())
+        if not is_updated:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Книга не найдена"
+            )
+        
+        await change_bus.publish(db, book_event("update", book_id, schema.amount))
         await db.commit()
+        catalog.touch(book_id)
         
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -283,6 +691,8 @@ async def update_book(
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as error:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
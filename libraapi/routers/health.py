@@ -0,0 +1,77 @@
+import asyncio
+
+from fastapi import APIRouter
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from sqlalchemy import text
+
+from core.config import settings
+from database.db import engine
+from utils.replica import replica_state
+from utils.lifecycle import lifecycle
+
+
+router = APIRouter()
+
+
+async def ping_database() -> None:
+    async with engine.connect() as conn:
+        await conn.execute(statement=text("SELECT 1"))
+
+
+@router.get("/health/live")
+async def get_liveness():
+    """
+    Проба живости: процесс отвечает на запросы. Бд не проверяется, чтобы
+    недоступная бд не приводила к перезапуску контейнера.
+
+    Возвращает:
+        json:
+        - status (str): "alive"
+    """
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "status": "alive"
+        }
+    )
+
+
+@router.get("/health/ready")
+async def get_readiness():
+    """
+    Проба готовности: воркер прогрет, не останавливается и основная бд
+    отвечает за settings.server.ready_timeout секунд. Недоступная реплика
+    не делает воркер неготовым, чтения тогда идут в основную бд.
+
+    Возвращает:
+        json:
+        - status (str): "ready"
+        - worker (dict): ready, stopping, startup_ms, pool_connections, replica_connections
+        - replica (dict | None): healthy, lag, max_lag, error, fallbacks; None если реплика не настроена
+
+    Ошибки:
+        503 (Service Unavailable) - с теми же полями, status "starting",
+        "stopping" или "unavailable" и error - ошибкой проверки бд
+    """
+    content = {
+        "status": "ready",
+        "worker": lifecycle.stats(),
+        "replica": replica_state.stats() if replica_state.enabled else None
+    }
+    if not lifecycle.ready:
+        content["status"] = "stopping" if lifecycle.stopping else "starting"
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=content)
+
+    try:
+        await asyncio.wait_for(ping_database(), timeout=settings.server.ready_timeout)
+    except Exception as error:
+        content["status"] = "unavailable"
+        content["error"] = str(error) or type(error).__name__
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=content)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=content
+    )
@@ -0,0 +1,104 @@
+from fastapi import APIRouter
+from fastapi import status
+from fastapi import Depends
+from fastapi.responses import JSONResponse
+
+from database.db import engine
+from database.db import replica_engine
+from database.pool import pool_metrics
+from database.pool import replica_pool_metrics
+
+from utils.cache import book_cache
+from utils.cache import reader_cache
+from utils.cache import token_cache
+from utils.hashed import hashing_pool
+from utils.replica import replica_state
+from utils.validate import get_current_user
+
+
+router = APIRouter()
+
+
+@router.get("/internal/cache")
+async def get_cache_stats(
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Возвращает счётчики кэшей текущего воркера.
+
+    Возвращает:
+        json:
+        - book (dict): size, maxsize, ttl, hits, misses, evictions кэша книг
+        - reader (dict): то же для кэша читателей по email
+        - token (dict): то же для кэша проверенных токенов
+    """
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "book": book_cache.stats(),
+            "reader": reader_cache.stats(),
+            "token": token_cache.stats()
+        }
+    )
+
+
+
+@router.get("/internal/hashing")
+async def get_hashing_stats(
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Возвращает состояние пула bcrypt текущего воркера.
+
+    Возвращает:
+        json:
+        - workers (int): размер пула
+        - in_flight (int): задач в работе и в очереди
+        - queued (int): задач в очереди сейчас
+        - max_queue (int): очередь, сверх которой вход отклоняется с 503
+        - peak_queued (int): наибольшая очередь с момента старта
+        - completed (int), failed (int), rejected (int): выполнено успешно,
+          завершилось ошибкой и отклонено задач
+    """
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=hashing_pool.stats()
+    )
+
+
+@router.get("/internal/pool")
+async def get_pool_stats(
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Возвращает состояние пула соединений с бд текущего воркера.
+
+    Каждый воркер держит свой пул, поэтому до pool_size + max_overflow
+    соединений на воркер. Время ожидания считается от запроса соединения
+    до его выдачи и включает открытие нового соединения.
+
+    Возвращает:
+        json:
+        - size (int), max_overflow (int), timeout (float): настройки пула
+        - checked_in (int): свободных соединений в пуле
+        - checked_out (int): соединений, занятых запросами
+        - overflow (int): открытых сверх pool_size
+        - peak_checked_out (int): наибольшее число занятых с момента старта
+        - acquired (int), timeouts (int): выдано соединений и отказов по pool_timeout
+        - wait_avg_ms, wait_p50_ms, wait_p95_ms, wait_p99_ms, wait_max_ms (float): время получения соединения
+        - replica (dict | None): те же поля для пула реплики и healthy,
+          lag, max_lag, error, fallbacks; None если реплика не настроена
+    """
+    replica = None
+    if replica_engine is not None:
+        replica = {
+            **replica_pool_metrics.stats(replica_engine.pool),
+            **replica_state.stats()
+        }
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            **pool_metrics.stats(engine.pool),
+            "replica": replica
+        }
+    )
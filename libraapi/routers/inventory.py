@@ -1,5 +1,3 @@
-from datetime import datetime
-
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import status
@@ -7,19 +5,21 @@ from fastapi.responses import JSONResponse
 from fastapi import HTTPException
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy import update
-from sqlalchemy import insert
 
-from database.models.inventory import InventoryDataModel
-from database.models.book import BookModels
-from database.models.reader import ReaderModel
+from database.repositories import inventory as inventory_repository
+from database.repositories import book as book_repository
 from database.schemas.inventory import IssueBookScheme
 from database.schemas.inventory import ReturnBookScheme
 from database.schemas.inventory import InventoryReaderByIDScheme
+from database.schemas.inventory import BulkIssueBookScheme
+from database.schemas.inventory import BulkReturnBookScheme
 
+from core.config import settings
 from dependencies.db import async_get_db
 from utils.validate import get_current_user
+from utils.catalog import catalog
+from utils.events import change_bus
+from utils.events import book_event
 
 
 router = APIRouter()
@@ -32,116 +32,288 @@ async def issue_book(
         db: AsyncSession = Depends(async_get_db),
         current_user: dict = Depends(get_current_user)
     ):
+    """
+    Выдаёт книгу читателю.
+
+    Выдача выполняется одной транзакцией: строка читателя блокируется
+    (FOR UPDATE), чтобы параллельные выдачи одному читателю не обошли
+    лимит, затем одним запросом считается число невозвращённых книг,
+    условно уменьшается остаток (UPDATE ... WHERE amount > 0) и
+    записывается выдача. Остаток не может уйти в минус даже при
+    одновременных выдачах одной книги. Тем же запросом обновляются
+    сводки аналитики (utils/circulation.py).
+
+    Параметры:
+        scheme: IssueBookScheme - book_id и reader_id
+
+    Возвращает:
+        json:
+        - issue: сообщение о выдаче
+        - id (int): id выдачи, нужен для возврата книги
+
+    Ошибки:
+        HTTPException: 404 если книги или читателя не существует
+        HTTPException: 409 если превышен лимит взятых книг или книг нет в наличии
+    """
     
-    #Проводим проверку книг перед выдачей
-    stmt_amount_book = select(BookModels).where(BookModels.id == scheme.book_id)
-    inject_book = await db.execute(statement=stmt_amount_book)
-    result_book = inject_book.scalar_one_or_none()
+    # Блокируем читателя до конца транзакции, чтобы лимит считался без гонок
+    is_reader = await inventory_repository.lock_reader(db, scheme.reader_id)
     
-    if result_book is None:
+    if not is_reader:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={
-                "error": "Книги с таким id не существует"
+                "error": "Такого читателя нет в системе"
             }
         )
-   
-    #Проводим проверку на наличие читателя
-    stmt_is_reader = select(ReaderModel).where(ReaderModel.id == scheme.reader_id)
-    inject_reader = await db.execute(statement=stmt_is_reader)
-    result_reader = inject_reader.scalar_one_or_none()
     
-    if result_reader is None:
+    # Считаем не сданные книги, списываем экземпляр и записываем выдачу одним запросом
+    result_issue = await inventory_repository.issue_book(
+        db,
+        book_id=scheme.book_id,
+        reader_id=scheme.reader_id,
+        max_open_loans=settings.inventory.max_open_loans
+    )
+    
+    if result_issue.loan_id is None:
+        if result_issue.open_loans >= settings.inventory.max_open_loans:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "error": "Превышен лимит взятых книг"
+                }
+            )
+        
+        # Остаток не списался: либо книги нет, либо нет экземпляров
+        is_book = await book_repository.book_exists(db, scheme.book_id)
+        if not is_book:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={
+                    "error": "Книги с таким id не существует"
+                }
+            )
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
+            status_code=status.HTTP_409_CONFLICT,
             detail={
-                "error": "Такого читателя нет в системе"
+                "error": "На данный момент книг нет в наличии"
             }
         )
     
-    # Проверяем сколько у читателя уже взято книг и может ли он взять ещё
-    stmt_amount_book_reader = select(InventoryDataModel)\
-                        .where(
-                            InventoryDataModel.reader_id == scheme.reader_id,
-                            InventoryDataModel.date_of_return == None
-                            )
-    inject_amount_book_reader = await db.execute(statement=stmt_amount_book_reader)
+    await change_bus.publish(db, book_event("issue", scheme.book_id, result_issue.amount))
+    await db.commit()
+    catalog.touch(scheme.book_id)
     
-    #Получаем кол-во не сданных книг
-    result_amount_book_reader = len(inject_amount_book_reader.scalars().all())
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "issue": "Типа выдана книга",
+            "id": result_issue.loan_id
+        }
+    )
     
-    if result_amount_book_reader == 3:
+@router.post("/inventory/return/")
+async def return_book(
+        scheme: ReturnBookScheme,
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Принимает книгу от читателя.
+
+    Закрытие выдачи и возврат экземпляра на полку выполняются одним
+    запросом. Выдача закрывается только если она ещё открыта, поэтому
+    повторный или параллельный возврат не увеличит остаток дважды.
+    Тем же запросом обновляются сводки аналитики (utils/circulation.py).
+
+    Параметры:
+        scheme: ReturnBookScheme - id выдачи и book_id
+
+    Возвращает:
+        json:
+        - return: сообщение о возврате
+
+    Ошибки:
+        HTTPException: 404 если открытой выдачи с таким id и book_id нет
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    
+    try:
+        # Записываем, что книгу вернули, и возвращаем её на "полку"
+        result_return = await inventory_repository.return_book(db, loan_id=scheme.id, book_id=scheme.book_id)
+        returned_book_id = None if result_return is None else result_return.id
+        
+        if returned_book_id is not None:
+            await change_bus.publish(db, book_event("return", scheme.book_id, result_return.amount))
+            await db.commit()
+            catalog.touch(scheme.book_id)
+    
+    except Exception as error:
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail={
-                "error": "Превышен лимит взятых книг"
+                "error": f"Непредвиденная ошибка: {error}"
             }
         )
     
-    # Проверяем что книги есть в наличии
-    if result_book.amount == 0:
+    if returned_book_id is None:
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
+            status_code=status.HTTP_404_NOT_FOUND,
             detail={
-                "error": "На данный момент книг нет в наличии"
+                "error": "Открытой выдачи с таким id нет"
             }
         )
-        
-    # Записываем данные о выдачи книги
-    stmt_inventory_add = insert(InventoryDataModel).values(scheme.model_dump())
-    await db.execute(statement=stmt_inventory_add)
-    await db.commit()
-    
-    # Обновляем кол-во книг из бд
-    
-    new_amount_book = int(result_book.amount) - 1
-    
-    stmt_update_amount_book = update(BookModels)\
-                            .where(BookModels.id == scheme.book_id)\
-                            .values(amount = new_amount_book)
-    await db.execute(statement=stmt_update_amount_book)
-    await db.commit()
-    
     
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
-            "issue": "Типа выдана книга"
+            "return": "Типа книга забрана"
         }
     )
-    
-@router.post("/inventory/return/")
-async def return_book(
-        scheme: ReturnBookScheme,
+
+
+def check_bulk_size(items: list) -> None:
+    if not items or len(items) > settings.inventory.max_bulk:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": f"В пачке должно быть от 1 до {settings.inventory.max_bulk} книг"
+            }
+        )
+
+
+@router.post("/inventory/issue/bulk")
+async def issue_books_bulk(
+        scheme: BulkIssueBookScheme,
         db: AsyncSession = Depends(async_get_db),
         current_user: dict = Depends(get_current_user)
     ):
+    """
+    Выдаёт пачку книг за одну транзакцию.
+
+    Читатели и книги пачки блокируются (FOR UPDATE, по возрастанию id, чтобы
+    параллельные пачки не взаимоблокировались), открытые выдачи считаются
+    одним GROUP BY, остатки списываются одним UPDATE ... FROM unnest, выдачи
+    записываются одним INSERT. Лимит взятых книг применяется к пачке целиком:
+    позиции сверх лимита читателя отклоняются в порядке следования.
+
+    Параметры:
+        scheme: BulkIssueBookScheme - items: список {book_id, reader_id}
+
+    Возвращает:
+        json:
+        - items (list): результат по каждой позиции в порядке запроса:
+            - book_id, reader_id
+            - status: "issued" или "rejected"
+            - id (int): id выдачи, если книга выдана
+            - error (str): причина отказа, если не выдана
+
+    Ошибки:
+        HTTPException: 400 если пачка пустая или больше settings.inventory.max_bulk
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    check_bulk_size(scheme.items)
+    reader_ids = sorted({item.reader_id for item in scheme.items})
+    book_ids = sorted({item.book_id for item in scheme.items})
     
     try:
-        # Записываем, что книгу вернули
-        stmt_return_book = update(InventoryDataModel)\
-                        .where(InventoryDataModel.id == scheme.id)\
-                        .values(date_of_return = datetime.now())
-        await db.execute(statement=stmt_return_book)
-        await db.commit()
-        
+        # Блокируем читателей, затем считаем их открытые выдачи уже после блокировки
+        readers = await inventory_repository.lock_readers(db, reader_ids)
+        open_loans = await inventory_repository.count_open_loans(db, reader_ids)
+        stock = await inventory_repository.lock_books(db, book_ids)
         
-        # Возвращаем книгу на "полку"
-        stmt_amount_book = select(BookModels).where(BookModels.id == scheme.book_id)
-        inject_book = await db.execute(statement=stmt_amount_book)
-        result_book = inject_book.scalar_one_or_none()
+        # Распределяем экземпляры и лимиты по позициям в порядке запроса
+        results = []
+        taken = {}
+        loans = []
+        for item in scheme.items:
+            result = {"book_id": item.book_id, "reader_id": item.reader_id, "status": "rejected"}
+            results.append(result)
+            
+            if item.reader_id not in readers:
+                result["error"] = "Такого читателя нет в системе"
+            elif item.book_id not in stock:
+                result["error"] = "Книги с таким id не существует"
+            elif open_loans.get(item.reader_id, 0) >= settings.inventory.max_open_loans:
+                result["error"] = "Превышен лимит взятых книг"
+            elif stock[item.book_id] <= 0:
+                result["error"] = "На данный момент книг нет в наличии"
+            else:
+                stock[item.book_id] -= 1
+                open_loans[item.reader_id] = open_loans.get(item.reader_id, 0) + 1
+                taken[item.book_id] = taken.get(item.book_id, 0) + 1
+                loans.append(result)
         
-        
-        new_amount_book = int(result_book.amount) + 1
-        
-        stmt_amount_book = update(BookModels)\
-                        .where(BookModels.id == scheme.book_id)\
-                        .values(amount = new_amount_book)
-        await db.execute(statement=stmt_amount_book)
-        await db.commit()
+        if loans:
+            loan_ids = await inventory_repository.issue_books(
+                db,
+                taken=taken,
+                items=[{"book_id": loan["book_id"], "reader_id": loan["reader_id"]} for loan in loans]
+            )
+            for loan, loan_id in zip(loans, loan_ids):
+                loan["status"] = "issued"
+                loan["id"] = loan_id
+            
+            await change_bus.publish(db, *[book_event("issue", book_id, stock[book_id]) for book_id in taken])
+            await db.commit()
+            for book_id in taken:
+                catalog.touch(book_id)
+    
+    except Exception as error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": f"Непредвиденная ошибка: {error}"
+            }
+        )
+    
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "items": results
+        }
+    )
 
-        
+
+@router.post("/inventory/return/bulk")
+async def return_books_bulk(
+        scheme: BulkReturnBookScheme,
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Принимает пачку книг.
+
+    Книги пачки блокируются по возрастанию id, как при пакетной выдаче,
+    чтобы параллельные пачки не взаимоблокировались. Открытые выдачи пачки закрываются одним UPDATE ... FROM unnest, остатки
+    книг увеличиваются одним UPDATE на каждую книгу по числу её закрытых
+    выдач. Уже закрытые или несуществующие выдачи пропускаются и
+    отмечаются в ответе.
+
+    Параметры:
+        scheme: BulkReturnBookScheme - items: список {id, book_id}
+
+    Возвращает:
+        json:
+        - items (list): результат по каждой позиции в порядке запроса:
+            - id, book_id
+            - status: "returned" или "rejected"
+            - error (str): причина отказа, если выдача не закрыта
+
+    Ошибки:
+        HTTPException: 400 если пачка пустая или больше settings.inventory.max_bulk
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    check_bulk_size(scheme.items)
     
+    try:
+        closed = await inventory_repository.return_books(db, [(item.id, item.book_id) for item in scheme.items])
+        
+        if closed:
+            await change_bus.publish(db, *[book_event("return", book_id) for book_id in set(closed.values())])
+            await db.commit()
+            for book_id in set(closed.values()):
+                catalog.touch(book_id)
     
     except Exception as error:
         raise HTTPException(
@@ -151,10 +323,18 @@ async def return_book(
             }
         )
     
+    results = []
+    for item in scheme.items:
+        result = {"id": item.id, "book_id": item.book_id, "status": "rejected"}
+        if closed.pop(item.id, None) == item.book_id:
+            result["status"] = "returned"
+        else:
+            result["error"] = "Открытой выдачи с таким id нет"
+        results.append(result)
     
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
-            "return": "Типа книга забрана"
+            "items": results
         }
-    )
\ No newline at end of file
+    )
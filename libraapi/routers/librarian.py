@@ -1,3 +1,11 @@
+import uuid
+
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+import jwt
+
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import status
@@ -8,8 +16,6 @@ from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import insert
-from sqlalchemy import select
 
 from dependencies.db import async_get_db
 from utils.hashed import Hashed
@@ -17,7 +23,10 @@ from database.schemas.librarian import RegisterLibrarianScheme
 from database.schemas.librarian import LoginLibrarianScheme
 from database.schemas.librarian import LibrarianByEmailScheme
 from database.schemas.token import JWTScheme
-from database.models.librarian import LibrarianModel
+from database.schemas.token import RefreshTokenScheme
+from database.repositories import librarian as librarian_repository
+
+from core.security import auth_jwt
 
 from utils.jwt_utils import decode_jwt, encode_jwt
 
@@ -26,6 +35,52 @@ from typing import Optional
 router = APIRouter()
 
 
+async def issue_tokens(
+        db: AsyncSession,
+        librarian_id: int,
+        email: str,
+        family: Optional[str] = None
+    ) -> JWTScheme:
+    """
+    Выдаёт пару access и refresh токенов и записывает refresh токен в бд.
+
+    Refresh токен содержит jti (ключ записи в refresh_tokens) и fam -
+    семейство токенов, которое тянется от входа по паролю через все
+    обновления. Коммит остаётся за вызывающим кодом.
+
+    Параметры:
+        family: str, optional - семейство при обновлении, None при входе
+    """
+    jti = uuid.uuid4().hex
+    family = family or uuid.uuid4().hex
+    expire = timedelta(days=auth_jwt.refresh_token_expire_days)
+
+    await librarian_repository.add_refresh_token(
+        db,
+        jti=jti,
+        family=family,
+        librarian_id=librarian_id,
+        expires_at=datetime.now(timezone.utc) + expire
+    )
+
+    return JWTScheme(
+        access_token=encode_jwt(
+            payload={
+                "sub": email,
+                "type": "access"
+            }
+        ),
+        refresh_token=encode_jwt(
+            payload={
+                "sub": email,
+                "type": "refresh",
+                "jti": jti,
+                "fam": family
+            },
+            expire_timedelta=expire
+        ),
+        token_type="Bearer",
+    )
 
 
 @router.post("/librarian/register/")
@@ -36,9 +91,7 @@ async def librarian_register(
 
     try:
         # Проверяем, существует ли пользователь с таким email
-        stmt_get_by_email = select(LibrarianModel).where(LibrarianModel.email == scheme.email)
-        result = await db.execute(statement=stmt_get_by_email)
-        is_librarian = result.scalar_one_or_none()
+        is_librarian = await librarian_repository.get_librarian_by_email(db, scheme.email)
         
         if is_librarian is not None:
             raise HTTPException(
@@ -48,13 +101,11 @@ async def librarian_register(
         
         
         # "Регистрация" библиотекоря
-        userdata = {
-            "email": scheme.email,
-            "password": await Hashed().hashed_password(scheme.password)
-        }
-        
-        stmt_add_librarian = insert(LibrarianModel).values(**userdata)
-        await db.execute(statement=stmt_add_librarian)
+        await librarian_repository.add_librarian(
+            db,
+            email=scheme.email,
+            password=await Hashed().hashed_password(scheme.password)
+        )
         await db.commit()
         
         
@@ -64,6 +115,9 @@ async def librarian_register(
                 "librarian": "Библиотекарь успешно зарегестрирован"
             }
         )
+    except HTTPException:
+        # 409 и 503 с Retry-After от hashing_pool отдаются клиенту как есть
+        raise
     except Exception as error:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -78,9 +132,7 @@ async def librarian_login(
         scheme: LoginLibrarianScheme,
         db: AsyncSession = Depends(async_get_db)
     ):
-    stmt = select(LibrarianModel).where(LibrarianModel.email == scheme.email)
-    is_librarian = await db.execute(statement=stmt)
-    result = is_librarian.scalar_one_or_none()
+    result = await librarian_repository.get_librarian_by_email(db, scheme.email)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -98,14 +150,64 @@ async def librarian_login(
                 detail="Invalid user"
             )
     
-    access_token = encode_jwt(
-        payload={
-            "sub": scheme.email,
-            "type": "access"
-        }
-    )
+    # Пароль верный и известен только сейчас: если стоимость bcrypt
+    # поменялась, перехэшируем его
+    if Hashed.needs_rehash(result.password):
+        await librarian_repository.rehash_password(
+            db,
+            librarian_id=result.id,
+            old_password=result.password,
+            new_password=await Hashed().hashed_password(scheme.password)
+        )
     
-    return JWTScheme(
-        access_token=access_token,
-        token_type="Bearer",
-    )
\ No newline at end of file
+    tokens = await issue_tokens(db, librarian_id=result.id, email=scheme.email)
+    await db.commit()
+    return tokens
+
+
+@router.post("/librarian/refresh/", response_model=JWTScheme)
+async def librarian_refresh(
+        scheme: RefreshTokenScheme,
+        db: AsyncSession = Depends(async_get_db)
+    ):
+    """
+    Обновляет access токен по refresh токену без проверки пароля.
+
+    Обновление - проверка подписи токена и один UPDATE по первичному ключу
+    refresh_tokens, bcrypt не вызывается. Токены ротируются: использованный
+    refresh токен больше не действует, в ответе новая пара токенов того же
+    семейства. Повторное предъявление уже использованного токена значит,
+    что он мог утечь, поэтому отзывается всё семейство и нужно войти по
+    паролю заново.
+
+    Параметры:
+        scheme: RefreshTokenScheme - refresh_token из /librarian/login/ или прошлого обновления
+
+    Возвращает:
+        JWTScheme: access_token, refresh_token, token_type
+
+    Ошибки:
+        HTTPException: 401 если токен некорректен, истёк, отозван или уже использован
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Недействительный refresh токен"
+    )
+    try:
+        payload = decode_jwt(scheme.refresh_token)
+    except jwt.PyJWTError:
+        raise invalid
+    if payload.get("type") != "refresh" or "jti" not in payload or "fam" not in payload:
+        raise invalid
+
+    now = datetime.now(timezone.utc)
+    librarian_id = await librarian_repository.use_refresh_token(db, payload["jti"], now=now)
+
+    if librarian_id is None:
+        await librarian_repository.revoke_token_family(db, payload["fam"], now=now)
+        await db.commit()
+        raise invalid
+
+    tokens = await issue_tokens(db, librarian_id=librarian_id, email=payload["sub"], family=payload["fam"])
+    await db.commit()
+    return tokens
\ No newline at end of file
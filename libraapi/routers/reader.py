@@ -1,12 +1,19 @@
+import asyncio
+
+from typing import Optional
+from datetime import datetime
+
 from fastapi import APIRouter
 from fastapi import status
 from fastapi import Depends
 from fastapi import HTTPException
+from fastapi import Path
+from fastapi import Query
+from fastapi import Request
 from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
-from sqlalchemy import insert
-from sqlalchemy import select
-from sqlalchemy import delete
+from pydantic import EmailStr
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
@@ -14,13 +21,45 @@ from dependencies.db import async_get_db
 
 from database.schemas.reader import AddReaderScheme
 from database.schemas.reader import GetByEmailReaderScheme
-from database.schemas.reader import GetReaderScheme
 from database.models.reader import ReaderModel
+from database.repositories import reader as reader_repository
 
+from core.config import settings
 from utils.validate import get_current_user
+from utils.pagination import encode_cursor
+from utils.pagination import decode_cursor
+from utils.cache import reader_cache
+from utils.replica import replica_state
+from utils.events import change_bus
+from utils.events import reader_event
+from utils.bulk import get_upload_format
+from utils.bulk import iter_records
+from utils.bulk import validate_record
+from utils.bulk import copy_upsert
 
 router = APIRouter()
 
+async def find_reader_by_email(db: AsyncSession, email: str) -> Optional[dict]:
+    """
+    Ищет читателя по email без учёта регистра.
+
+    Поиск идёт по уникальному индексу lower(email), найденные читатели
+    кэшируются в reader_cache до удаления читателя или истечения ttl.
+
+    Возвращает:
+        dict | None - email, fullname, id или None если читателя нет
+    """
+    key = email.lower()
+    reader = reader_cache.get(key)
+    if reader is None:
+        reader = await reader_repository.get_reader_by_email(db, key)
+        if reader is None:
+            return None
+        if replica_state.fresh(db):
+            reader_cache.set(key, reader)
+    return reader
+
+
 
 @router.post("/reader/")
 async def add_reader(
@@ -52,8 +91,7 @@ async def add_reader(
     }
     """
     try:
-        stmt = insert(ReaderModel).values(scheme.model_dump())
-        await db.execute(statement=stmt)
+        await reader_repository.add_reader(db, scheme.model_dump())
         await db.commit()
         
         return JSONResponse(
@@ -74,6 +112,169 @@ async def add_reader(
                 detail=f"Неизвестная ошибка: {error}"
             )
 
+@router.post("/reader/bulk")
+async def add_readers_bulk(
+        request: Request,
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Массово загружает читателей из CSV или NDJSON файла.
+
+    Тело запроса читается потоком и обрабатывается пачками по settings.bulk.chunk_size
+    строк: каждая строка проверяется по схеме AddReaderScheme, валидные строки
+    грузятся через COPY и переносятся в таблицу upsert-ом по lower(email).
+    Если читатель с таким email (без учёта регистра) уже есть или встречается
+    в файле раньше, его fullname перезаписывается. Вся загрузка выполняется
+    одной транзакцией.
+
+    Проверка EmailStr заметно дороже остальной обработки строки, поэтому
+    пачка проверяется в отдельном потоке и не останавливает event loop для
+    других запросов.
+
+    Параметры:
+        Тело запроса с Content-Type:
+        - text/csv: первая строка - заголовок fullname,email
+        - application/x-ndjson: по одному json объекту на строку
+
+    Возвращает:
+        json:
+        - inserted (int): сколько читателей добавлено
+        - updated (int): сколько читателей обновлено
+        - rejected (int): сколько строк отклонено
+        - errors (list): первые settings.bulk.max_errors ошибок вида {"row": номер строки, "errors": [...]}
+
+    Ошибки:
+        HTTPException: 415 если формат файла не поддерживается
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    upload_format = get_upload_format(request)
+    report = {"inserted": 0, "updated": 0, "rejected": 0, "errors": []}
+
+    def reject(row: int, errors: list):
+        report["rejected"] += 1
+        if len(report["errors"]) < settings.bulk.max_errors:
+            report["errors"].append({"row": row, "errors": errors})
+
+    async def flush(chunk: dict):
+        inserted, updated = await copy_upsert(
+            db=db,
+            table=ReaderModel.__tablename__,
+            columns=["fullname", "email"],
+            records=list(chunk.values()),
+            conflict="((lower(email)))",
+            update_columns=["fullname"],
+        )
+        report["inserted"] += inserted
+        report["updated"] += updated
+
+    def validate_batch(batch: list) -> list:
+        return [(row, validate_record(record, AddReaderScheme)) for row, record in batch]
+
+    async def load(batch: list):
+        # Ключ - lower(email), чтобы повтор email внутри пачки не ломал upsert
+        chunk = {}
+        for row, reader in await asyncio.to_thread(validate_batch, batch):
+            if isinstance(reader, list):
+                reject(row, reader)
+                continue
+            key = reader.email.lower()
+            chunk.pop(key, None)
+            chunk[key] = (reader.fullname, reader.email)
+        if chunk:
+            await flush(chunk)
+
+    try:
+        batch = []
+        async for row, record in iter_records(request, upload_format):
+            batch.append((row, record))
+            if len(batch) >= settings.bulk.chunk_size:
+                await load(batch)
+                batch = []
+
+        if batch:
+            await load(batch)
+        await change_bus.publish(db, reader_event("reader_import"))
+        await db.commit()
+        reader_cache.clear()
+
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content=report
+        )
+    except Exception as error:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Неизвестная ошибка: {error}"
+        )
+
+
+@router.get("/reader/search")
+async def search_readers(
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(settings.pagination.default_limit, gt=0, le=settings.pagination.max_limit),
+        cursor: Optional[str] = Query(None),
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Ищет читателей по ФИО с ранжированием результатов.
+
+    Находит ФИО, которые начинаются с q (без учёта регистра), и ФИО, в
+    которых есть слово, похожее на q (pg_trgm word_similarity, находит и с
+    опечатками). Оба условия обслуживает один GIN индекс
+    ix_reader_fullname_trgm, поэтому поиск - один индексный запрос.
+    Совпадения по началу строки идут первыми, дальше по похожести;
+    пагинация курсорная по (rank, id).
+
+    Параметры:
+        q: str - часть ФИО, например "Иванов" или "Ивонов"
+        limit: int - размер страницы (не больше settings.pagination.max_limit)
+        cursor: str, optional - next_cursor из предыдущего ответа
+
+    Возвращает:
+        json:
+        - readers (list): email, fullname, id и rank (float) найденных читателей
+        - next_cursor (str | None): курсор следующей страницы, None если страница последняя
+
+    Ошибки:
+        HTTPException: 400 ошибка если курсор некорректен
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    after = None
+    if cursor is not None:
+        last_rank, last_id = decode_cursor(cursor, size=2)
+        if not isinstance(last_id, int) or not isinstance(last_rank, (int, float)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некорректный курсор"
+            )
+        after = (last_rank, last_id)
+
+    try:
+        rows = await reader_repository.search_readers(db, q=q, limit=limit, after=after)
+        readers_list = rows[:limit]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = readers_list[-1]
+            next_cursor = encode_cursor(last["rank"], last["id"])
+
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "readers": readers_list,
+                "next_cursor": next_cursor
+            }
+        )
+    except Exception as error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Неизвестная ошибка: {error}"
+        )
+
+
 @router.post("/reader/data")
 async def get_reader_by_email(
         scheme: GetByEmailReaderScheme,
@@ -81,7 +282,8 @@ async def get_reader_by_email(
         current_user: dict = Depends(get_current_user)
     ):
     """
-    Получает информацию о читателе по его email.
+    Получает информацию о читателе по его email без учёта регистра.
+    Для частых запросов используйте GET /reader/by-email/{email}.
 
     Параметры:
     - scheme: Данные для поиска читателя согласно схеме GetByEmailReaderScheme, включая:
@@ -116,27 +318,70 @@ async def get_reader_by_email(
     }
     """
     try:
-        stmt = select(ReaderModel).where(ReaderModel.email == scheme.email).execution_options(expire_on_commit=False)
-        result = await db.execute(statement=stmt)
-        reader = result.scalar_one_or_none()
-        if reader is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Читатель не найден"
+        reader = await find_reader_by_email(db, scheme.email)
+    except Exception as error:
+        raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Неизвестная ошибка: {error}"
             )
-        result = GetReaderScheme.model_validate(reader).model_dump()
-        return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={
-                "reader": result
-            }
+    if reader is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Читатель не найден"
         )
+    return ORJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "reader": reader
+        }
+    )
+
+
+@router.get("/reader/by-email/{email}")
+async def get_reader_by_email_path(
+        email: EmailStr = Path(...),
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Получает читателя по email без учёта регистра, GET-вариант /reader/data.
+
+    Используется сканером читательских билетов на каждом посещении, поэтому
+    ответ берётся из кэша процесса и разрешает приватное кэширование
+    клиенту на settings.cache.reader.ttl секунд.
+
+    Параметры:
+        email: str - email читателя
+
+    Возвращает:
+        json:
+        - reader (dict): email, fullname, id
+
+    Ошибки:
+        HTTPException: 404 - Если читатель с указанным email не найден
+        HTTPException: 500 - Внутренняя ошибка сервера при возникновении непредвиденных ситуаций
+    """
+    try:
+        reader = await find_reader_by_email(db, email)
     except Exception as error:
         raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Неизвестная ошибка: {error}"
             )
-        
+    if reader is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Читатель не найден"
+        )
+    return ORJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "reader": reader
+        },
+        headers={"Cache-Control": f"private, max-age={int(settings.cache.reader.ttl)}"}
+    )
+
+
 @router.delete("/reader/{reader_id}")
 async def delete_reader_by_id(
         reader_id: int,
@@ -156,20 +401,131 @@ async def delete_reader_by_id(
 
     Ошибки:
         HTTPException: 404 ошибка если читатель с таким id не найдена
+        HTTPException: 409 ошибка если у читателя есть история выдач
         HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
     """
     
-    stmt = delete(ReaderModel).where(ReaderModel.id == reader_id).returning(ReaderModel)
-    result_delete_reader = await db.execute(statement=stmt)
-    if result_delete_reader.scalar_one_or_none() is None:
+    try:
+        email = await reader_repository.delete_reader(db, reader_id)
+    except IntegrityError:
+        raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Читателя нельзя удалить: у него есть история выдач"
+            )
+    if email is None:
         raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail=f"Такого пользователя не существует"
                 )
+    await change_bus.publish(db, reader_event("reader_delete", email))
     await db.commit()
+    reader_cache.invalidate(email.lower())
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
                 "delete": "successfully"
             }
-    )
\ No newline at end of file
+    )
+
+@router.get("/reader/{reader_id}/loans")
+async def get_reader_loans(
+        reader_id: int = Path(..., gt=0),
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Получает книги, которые читатель взял и ещё не вернул.
+
+    Выдачи и данные книг выбираются одним запросом с join по
+    частичному индексу открытых выдач.
+
+    Параметры:
+        reader_id: int, больше 0
+
+    Возвращает:
+        json:
+        - loans (list): открытые выдачи от новых к старым:
+            - id (int): id выдачи
+            - book_id (int), name (str), author (str), isnb (str, optional): книга
+            - date_of_issue (datetime): дата выдачи
+            - date_of_return (None)
+
+    Ошибки:
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    try:
+        loans = await reader_repository.get_open_loans(db, reader_id)
+        
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "loans": loans
+            }
+        )
+    except Exception as error:
+        raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Неизвестная ошибка: {error}"
+            )
+
+
+@router.get("/reader/{reader_id}/loans/history")
+async def get_reader_loans_history(
+        reader_id: int = Path(..., gt=0),
+        limit: int = Query(settings.pagination.default_limit, gt=0, le=settings.pagination.max_limit),
+        cursor: Optional[str] = Query(None),
+        db: AsyncSession = Depends(async_get_db),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Получает страницу истории выдач читателя, включая возвращённые книги.
+
+    Пагинация курсорная по (date_of_issue, id) от новых выдач к старым,
+    поэтому время ответа не растёт с длиной истории читателя. Выдачи из
+    секций, перенесённых в архив (cli.py archive), в историю не входят.
+
+    Параметры:
+        reader_id: int, больше 0
+        limit: int - размер страницы (не больше settings.pagination.max_limit)
+        cursor: str, optional - next_cursor из предыдущего ответа
+
+    Возвращает:
+        json:
+        - loans (list): выдачи в том же формате, что и в /reader/{reader_id}/loans
+        - next_cursor (str | None): курсор следующей страницы, None если страница последняя
+
+    Ошибки:
+        HTTPException: 400 ошибка если курсор некорректен
+        HTTPException: 500 ошибка при возникновении непредвиденных ситуаций
+    """
+    after = None
+    if cursor is not None:
+        last_issue, last_id = decode_cursor(cursor, size=2)
+        try:
+            after = (datetime.fromisoformat(last_issue), int(last_id))
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некорректный курсор"
+            )
+    
+    try:
+        loans = await reader_repository.get_loans_history(db, reader_id, limit=limit, after=after)
+        
+        next_cursor = None
+        if len(loans) > limit:
+            loans.pop()
+            next_cursor = encode_cursor(loans[-1]["date_of_issue"].isoformat(), loans[-1]["id"])
+        
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "loans": loans,
+                "next_cursor": next_cursor
+            }
+        )
+    except Exception as error:
+        raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Неизвестная ошибка: {error}"
+            )
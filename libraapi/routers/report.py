@@ -0,0 +1,116 @@
+from fastapi import APIRouter
+from fastapi import status
+from fastapi import Depends
+from fastapi import Path
+from fastapi import Query
+from fastapi import HTTPException
+from fastapi import BackgroundTasks
+from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse
+
+from core.config import settings
+from utils.validate import get_current_user
+from utils.reports import REPORT_FORMATS
+from utils.reports import new_report_id
+from utils.reports import report_path
+from utils.reports import start_report
+from utils.reports import purge_reports
+from utils.reports import write_overdue_report
+
+
+router = APIRouter()
+
+
+@router.post("/report/overdue")
+async def create_overdue_report(
+        background_tasks: BackgroundTasks,
+        report_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+        days: int = Query(settings.reports.loan_period_days, gt=0),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Запускает построение отчёта о просроченных выдачах в фоне.
+
+    Ответ возвращается сразу, отчёт строится после него фоновой задачей
+    и пишется в файл потоково. Готовый файл забирается через
+    GET /report/overdue/{report_id}; отчёт отмечается начатым до ответа,
+    поэтому GET сразу после него получает "pending", а не 404. Там же
+    удаляются отчёты и ошибки старше settings.reports.keep_days дней.
+
+    Параметры:
+        format: str - ndjson (по умолчанию) или csv
+        days: int - срок выдачи в днях, по умолчанию settings.reports.loan_period_days
+
+    Возвращает:
+        json, код 202:
+        - report_id (str): идентификатор отчёта
+        - status: "pending"
+    """
+    report_id = new_report_id()
+    path = report_path(report_id, report_format)
+    start_report(path)
+    background_tasks.add_task(
+        write_overdue_report,
+        path=path,
+        report_format=report_format,
+        loan_period_days=days,
+    )
+    background_tasks.add_task(purge_reports)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "report_id": report_id,
+            "status": "pending"
+        }
+    )
+
+
+@router.get("/report/overdue/{report_id}")
+async def get_overdue_report(
+        report_id: str = Path(..., pattern="^[0-9a-f]{32}$"),
+        report_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+        current_user: dict = Depends(get_current_user)
+    ):
+    """
+    Отдаёт готовый отчёт о просроченных выдачах.
+
+    Параметры:
+        report_id: str - идентификатор из POST /report/overdue
+        format: str - формат, с которым отчёт запускался
+
+    Возвращает:
+        - файл отчёта, если он готов
+        - json {"status": "pending"} с кодом 202, если отчёт ещё строится
+
+    Ошибки:
+        HTTPException: 404 если отчёта нет
+        HTTPException: 500 если построение отчёта завершилось ошибкой
+    """
+    path = report_path(report_id, report_format)
+    if path.exists():
+        return FileResponse(
+            path=path,
+            media_type=REPORT_FORMATS[report_format],
+            filename=path.name
+        )
+
+    if path.with_name(path.name + ".part").exists():
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "report_id": report_id,
+                "status": "pending"
+            }
+        )
+
+    error = path.with_name(path.name + ".error")
+    if error.exists():
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка построения отчёта: {error.read_text()}"
+        )
+
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Отчёт не найден"
+    )
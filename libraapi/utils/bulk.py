@@ -0,0 +1,237 @@
+import csv
+import json
+import codecs
+
+from collections import deque
+
+from typing import Any
+from typing import AsyncIterator
+
+from fastapi import Request
+from fastapi import HTTPException
+from fastapi import status
+
+from pydantic import BaseModel
+from pydantic import ValidationError
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+CSV_TYPES = ("text/csv", "application/csv")
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def get_upload_format(request: Request) -> str:
+    """
+    Определяет формат загружаемого файла по Content-Type.
+
+    Ошибки:
+        HTTPException: 415 если формат не CSV и не NDJSON
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in CSV_TYPES:
+        return "csv"
+    if content_type in NDJSON_TYPES:
+        return "ndjson"
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Ожидается text/csv или application/x-ndjson"
+    )
+
+
+class LineQueue():
+    """
+    Источник строк для csv.reader: отдаёт накопленные строки, а пустую
+    очередь reader видит как конец данных на данный момент.
+    """
+
+    def __init__(self):
+        self.lines: deque[str] = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+def ends_in_quotes(line: str, quoted: bool) -> bool:
+    """
+    Остаётся ли открытым поле в кавычках после строки line (по правилам
+    диалекта csv.excel), quoted - было ли оно открыто до этой строки.
+    Кавычка в середине поля без кавычек - обычный символ, "" - экранированная кавычка.
+    """
+    if '"' not in line:
+        return quoted
+    field_start = not quoted
+    closed = False
+    for char in line:
+        if quoted:
+            if char == '"':
+                quoted, closed = False, True
+        elif char == '"' and (field_start or closed):
+            # Открывающая кавычка или вторая кавычка пары ""
+            quoted, closed = True, False
+        else:
+            field_start, closed = char in ",\r\n", False
+    return quoted
+
+
+async def iter_lines(request: Request) -> AsyncIterator[str]:
+    """Потоково декодирует тело запроса и отдаёт его по строкам вместе с переводом строки"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in request.stream():
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line + "\n"
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_records(request: Request, upload_format: str) -> AsyncIterator[tuple[int, Any]]:
+    """
+    Потоково читает тело запроса и отдаёт записи по одной вместе с номером строки.
+
+    Тело не загружается в память целиком: куски декодируются по мере
+    поступления и режутся на строки. Для CSV первая строка - заголовок,
+    пустые ячейки превращаются в None. Все строки CSV разбирает один
+    csv.reader, поэтому поле в кавычках может содержать перевод строки:
+    строки копятся, пока кавычки записи не закроются, номер записи -
+    номер её первой строки. Строка NDJSON, которая не является валидным
+    json, отдаётся как есть (str), чтобы вызывающий код записал её в
+    отчёт об ошибках.
+    """
+    line_no = 0
+
+    if upload_format == "ndjson":
+        async for line in iter_lines(request):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError:
+                yield line_no, line.rstrip("\r\n")
+        return
+
+    queue = LineQueue()
+    reader = csv.reader(queue)
+    header = None
+    quoted = False
+    first_line = 0
+
+    def parse(cells: list[str]):
+        nonlocal header
+        if not cells or (len(cells) == 1 and not cells[0].strip()):
+            return None
+        if header is None:
+            header = [cell.strip() for cell in cells]
+            return None
+        return {
+            key: (value if value != "" else None)
+            for key, value in zip(header, cells)
+        }
+
+    async for line in iter_lines(request):
+        line_no += 1
+        if not quoted:
+            first_line = line_no
+        queue.lines.append(line)
+        quoted = ends_in_quotes(line, quoted)
+        if quoted:
+            continue
+        record = parse(next(reader, []))
+        if record is not None:
+            yield first_line, record
+
+    # Кавычка не закрыта до конца файла: reader отдаёт поле как есть
+    if queue.lines:
+        record = parse(next(reader, []))
+        if record is not None:
+            yield first_line, record
+
+
+def validate_record(record: Any, schema: type[BaseModel]) -> BaseModel | list:
+    """
+    Проверяет запись по pydantic схеме.
+
+    Возвращает экземпляр схемы, либо список ошибок в json-совместимом виде.
+    """
+    if not isinstance(record, dict):
+        return [{"msg": "Строка не является объектом"}]
+    try:
+        return schema.model_validate(record)
+    except ValidationError as error:
+        return error.errors(include_url=False, include_context=False, include_input=False)
+
+
+async def copy_upsert(
+        db: AsyncSession,
+        table: str,
+        columns: list[str],
+        records: list[tuple],
+        conflict: str,
+        update_columns: list[str],
+    ) -> tuple[int, int]:
+    """
+    Загружает пачку записей через COPY во временную таблицу и переносит
+    их в основную одним INSERT ... ON CONFLICT DO UPDATE.
+
+    Временные таблицы живут до конца транзакции, коммит остаётся за
+    вызывающим кодом. В records не должно быть двух строк с одинаковым
+    ключом conflict, иначе postgres отклонит upsert.
+
+    Счётчики общие для всех пачек одной транзакции: id затронутых строк
+    запоминаются во временной таблице, и строка, которую уже добавила или
+    обновила предыдущая пачка той же загрузки, при повторе ключа больше не
+    считается. У table должен быть первичный ключ id.
+
+    Возвращает:
+        (inserted, updated) - сколько строк добавлено и сколько обновлено
+        впервые за транзакцию
+    """
+    staging = f"_staging_{table}"
+    upserted_ids = f"_upserted_{table}"
+    column_list = ", ".join(columns)
+
+    # Через сессию, чтобы таблицы создались внутри её транзакции
+    await db.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS "
+        f"SELECT {column_list} FROM {table} WITH NO DATA"
+    ))
+    await db.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {upserted_ids} (id integer PRIMARY KEY) ON COMMIT DROP"
+    ))
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        staging,
+        records=records,
+        columns=columns,
+    )
+
+    update_list = ", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+    # Подзапрос к upserted_ids видит снимок до запроса, то есть только предыдущие пачки
+    result = await db.execute(text(
+        f"WITH upserted AS ("
+        f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} "
+        f"ON CONFLICT {conflict} DO UPDATE SET {update_list} "
+        f"RETURNING id, (xmax = 0) AS inserted"
+        f"), remembered AS ("
+        f"INSERT INTO {upserted_ids} (id) SELECT id FROM upserted ON CONFLICT DO NOTHING"
+        f"), first_seen AS ("
+        f"SELECT inserted FROM upserted "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {upserted_ids} WHERE {upserted_ids}.id = upserted.id)"
+        f") SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM first_seen"
+    ))
+    inserted, updated = result.one()
+
+    await db.execute(text(f"TRUNCATE {staging}"))
+    return inserted, updated
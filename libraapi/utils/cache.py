@@ -0,0 +1,72 @@
+import time
+
+from typing import Any
+from typing import Hashable
+from typing import Optional
+from collections import OrderedDict
+
+from core.config import settings
+
+
+class LRUCache():
+    """
+    Ограниченный по размеру LRU кэш внутри процесса с временем жизни записей.
+
+    При переполнении вытесняется запись, к которой дольше всех не обращались.
+    Запись старше ttl секунд считается промахом и удаляется при чтении.
+    Кэш рассчитан на один event loop, поэтому блокировки не используются.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+book_cache = LRUCache(**settings.cache.book.model_dump())
+reader_cache = LRUCache(**settings.cache.reader.model_dump())
+token_cache = LRUCache(**settings.cache.token.model_dump())
@@ -0,0 +1,74 @@
+import hashlib
+
+from typing import Hashable
+from typing import Optional
+
+from core.config import settings
+from utils.cache import LRUCache
+from utils.cache import book_cache
+
+
+class CatalogVersion():
+    """
+    Версия каталога книг и кэш готовых байтовых снимков ответов /book/.
+
+    Версия увеличивается при каждой записи в books (добавление, изменение,
+    удаление, выдача и возврат). Вместе с ней сбрасываются закэшированная
+    карточка книги и все снимки страниц каталога, так что снимки
+    перестраиваются только после записи.
+
+    ETag строится из содержимого ответа, а не из версии: счётчик у
+    каждого процесса свой (воркеры стартуют в разное время и видят
+    чужие записи с задержкой), а одинаковые данные дают одинаковый ETag
+    в любом воркере и после перезапуска. Поэтому If-None-Match,
+    полученный от одного воркера, проверяется и другим.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.snapshots = LRUCache(**settings.cache.catalog_snapshot.model_dump())
+
+    @staticmethod
+    def etag(body: bytes) -> str:
+        """ETag ответа с телом body"""
+        return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        """
+        Проверяет, есть ли etag в заголовке If-None-Match.
+
+        "*" (есть любое представление) не считается совпадением: версия
+        каталога не знает, существует ли запрошенная книга, поэтому 304
+        отдаётся только на конкретный ETag
+        """
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags
+
+    def get_snapshot(self, key: Hashable) -> Optional[tuple[bytes, str]]:
+        """Возвращает (тело, ETag) снимка или None"""
+        return self.snapshots.get(key)
+
+    def set_snapshot(self, key: Hashable, body: bytes, etag: str, version: int) -> None:
+        # Снимок, собранный до записи, не должен попасть в кэш новой версии
+        if version == self.value:
+            self.snapshots.set(key, (body, etag))
+
+    def touch(self, book_id: Optional[int] = None) -> None:
+        """
+        Отмечает изменение каталога.
+
+        Параметры:
+            book_id: int, optional - id изменённой книги, None если изменились многие книги
+        """
+        self.value += 1
+        self.snapshots.clear()
+        if book_id is None:
+            book_cache.clear()
+        else:
+            book_cache.invalidate(book_id)
+
+
+catalog = CatalogVersion()
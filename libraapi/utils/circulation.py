@@ -0,0 +1,80 @@
+from sqlalchemy import Select
+from sqlalchemy import Date
+from sqlalchemy import Integer
+from sqlalchemy import func
+from sqlalchemy import cast
+from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql.selectable import CTE
+
+from database.models.circulation import CirculationMonthlyModel
+from database.models.circulation import CirculationBookModel
+
+
+CURRENT_MONTH = cast(func.date_trunc("month", func.now()), Date)
+
+
+def counts_select() -> Select:
+    """
+    Строки (book_id, amount) для пакетных выдач и возвратов из параметров
+    circulation_book_ids и circulation_amounts (см. counts_params)
+    """
+    rows = func.unnest(
+        bindparam("circulation_book_ids", type_=ARRAY(Integer)),
+        bindparam("circulation_amounts", type_=ARRAY(Integer)),
+    ).table_valued("book_id", "amount").render_derived()
+    return select(rows.c.book_id, rows.c.amount)
+
+
+def counts_params(counts: dict[int, int]) -> dict:
+    """Параметры counts_select из словаря book_id -> количество"""
+    return {
+        "circulation_book_ids": list(counts.keys()),
+        "circulation_amounts": list(counts.values()),
+    }
+
+
+def record_circulation(rows: Select, event: str) -> list[CTE]:
+    """
+    Собирает CTE, которые учитывают выдачи или возвраты в сводных таблицах.
+
+    CTE добавляются к запросу выдачи или возврата через add_cte, поэтому
+    сводки меняются тем же запросом, что и inventorydata, и не расходятся
+    с ней.
+
+    Параметры:
+        rows: Select - колонки book_id и amount, book_id не повторяются
+        event: str - issue или return
+
+    Возвращает:
+        list[CTE] - изменения circulation_monthly и circulation_books
+    """
+    counted = rows.subquery("counted")
+
+    counter = "issued" if event == "issue" else "returned"
+    monthly = insert(CirculationMonthlyModel)\
+                .from_select(["book_id", "month", counter], select(counted.c.book_id, CURRENT_MONTH, counted.c.amount))
+    monthly = monthly.on_conflict_do_update(
+        index_elements=[CirculationMonthlyModel.book_id, CirculationMonthlyModel.month],
+        set_={counter: getattr(CirculationMonthlyModel, counter) + getattr(monthly.excluded, counter)}
+    )
+
+    if event == "issue":
+        books = insert(CirculationBookModel)\
+                .from_select(["book_id", "issued", "on_loan"], select(counted.c.book_id, counted.c.amount, counted.c.amount))
+        books = books.on_conflict_do_update(
+            index_elements=[CirculationBookModel.book_id],
+            set_={
+                "issued": CirculationBookModel.issued + books.excluded.issued,
+                "on_loan": CirculationBookModel.on_loan + books.excluded.on_loan,
+            }
+        )
+    else:
+        books = update(CirculationBookModel)\
+                .where(CirculationBookModel.book_id == counted.c.book_id)\
+                .values(on_loan = CirculationBookModel.on_loan - counted.c.amount)
+
+    return [monthly.cte("circulation_monthly_count"), books.cte("circulation_books_count")]
@@ -0,0 +1,178 @@
+import uuid
+import asyncio
+import logging
+
+from typing import Optional
+from contextlib import asynccontextmanager
+
+import orjson
+
+from sqlalchemy import text
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import TEXT
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from database.db import service_engine
+from utils.catalog import catalog
+from utils.cache import reader_cache
+from utils.replica import replica_state
+
+
+logger = logging.getLogger(__name__)
+
+def book_event(event: str, book_id: Optional[int] = None, amount: Optional[int] = None) -> dict:
+    """
+    Собирает событие изменения каталога.
+
+    Параметры:
+        event: str - create, update, delete, issue или return
+        book_id: int, optional - id книги, None если изменились многие книги
+        amount: int, optional - остаток книги после изменения, если известен
+    """
+    return {"event": event, "book_id": book_id, "amount": amount}
+
+
+def reader_event(event: str, email: Optional[str] = None) -> dict:
+    """
+    Собирает событие изменения читателя. Такие события только сбрасывают
+    кэш читателей в других процессах и не попадают в GET /book/changes.
+
+    Параметры:
+        event: str - reader_delete или reader_import
+        email: str, optional - email читателя, None если изменились многие читатели
+    """
+    return {"event": event, "email": email.lower() if email is not None else None}
+
+
+class ChangeBus():
+    """
+    Шина изменений каталога поверх Postgres LISTEN/NOTIFY.
+
+    Запись публикует события через pg_notify в своей транзакции, поэтому
+    они доставляются только после commit и пропадают при rollback. Каждый
+    процесс держит одно слушающее подключение и:
+    - сбрасывает свои кэши каталога и читателей по событиям других процессов;
+    - раздаёт события каталога подписчикам (потокам GET /book/changes).
+
+    Если слушающее подключение оборвалось, события за время обрыва
+    потеряны: кэши сбрасываются целиком, подписчики получают resync.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self.subscribers: set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    async def publish(self, db: AsyncSession, *events: dict) -> None:
+        """Отправляет события в транзакции сессии db, доставка после commit"""
+        if not events:
+            return
+        replica_state.note_change()
+        payloads = [
+            orjson.dumps({**event, "origin": self.origin}).decode("utf-8") for event in events
+        ]
+        stmt = text("SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload")\
+                .bindparams(
+                    bindparam("channel", self.channel),
+                    bindparam("payloads", payloads, type_=ARRAY(TEXT)),
+                )
+        await db.execute(statement=stmt)
+
+    @asynccontextmanager
+    async def subscribe(self):
+        """Подписка на события: очередь, в которую попадают все события каталога"""
+        queue = asyncio.Queue(maxsize=settings.events.queue_size)
+        self.subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers.discard(queue)
+
+    def dispatch(self, event: dict) -> None:
+        """Сбрасывает кэши, если событие пришло из другого процесса, и раздаёт его подписчикам"""
+        origin = event.pop("origin", None)
+        # Изменение любого процесса: пока реплика его не применила,
+        # прочитанное с неё не кэшируется
+        replica_state.note_change()
+        if event["event"].startswith("reader_"):
+            if origin != self.origin:
+                if event.get("email") is None:
+                    reader_cache.clear()
+                else:
+                    reader_cache.invalidate(event["email"])
+            return
+        if origin != self.origin:
+            catalog.touch(event.get("book_id"))
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Подписчик не успевает читать: вместо пропуска отдельных
+                # событий просим его перечитать состояние целиком
+                queue.get_nowait()
+                queue.put_nowait({"event": "resync"})
+
+    def on_notify(self, connection, pid, channel, payload) -> None:
+        # В канал может написать кто угодно через pg_notify: событие не
+        # того вида пропускается, а не роняет обработку
+        try:
+            event = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            event = None
+        if not isinstance(event, dict) or not isinstance(event.get("event"), str):
+            logger.warning("Некорректное событие в канале %s: %s", channel, payload)
+            return
+        self.dispatch(event)
+
+    async def listen(self) -> None:
+        """
+        Держит слушающее подключение и переподключается при обрыве.
+
+        Обрыв, о котором сообщил драйвер, виден сразу. Подключение, которое
+        перестало отвечать без обрыва (сеть, зависший сервер), находит
+        проверка SELECT 1 раз в settings.events.ping_interval секунд.
+        """
+        while True:
+            lost = asyncio.Event()
+            try:
+                async with service_engine.connect() as conn:
+                    driver = (await conn.get_raw_connection()).driver_connection
+                    driver.add_termination_listener(lambda connection: lost.set())
+                    await driver.add_listener(self.channel, self.on_notify)
+                    while not lost.is_set():
+                        try:
+                            await asyncio.wait_for(lost.wait(), timeout=settings.events.ping_interval)
+                        except asyncio.TimeoutError:
+                            try:
+                                await asyncio.wait_for(driver.fetchval("SELECT 1"), timeout=settings.events.ping_timeout)
+                            except Exception:
+                                # Закрываем без обмена с сервером, иначе выход
+                                # из connect() зависнет на том же подключении
+                                driver.terminate()
+                                raise
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning("Слушатель канала %s отключился: %s", self.channel, str(error) or type(error).__name__)
+            reader_cache.clear()
+            self.dispatch({"event": "resync", "book_id": None})
+            await asyncio.sleep(settings.events.reconnect_delay)
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.listen())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+change_bus = ChangeBus(settings.events.channel)
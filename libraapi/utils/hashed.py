@@ -1,22 +1,111 @@
+import asyncio
+
+from typing import Any
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
-"""
-TODO: Раскидать комментарии
-"""
+from fastapi import HTTPException
+from fastapi import status
+
+from core.config import settings
+
+
+class HashingPool():
+    """
+    Отдельный пул потоков для bcrypt.
+
+    Хэширование и проверка пароля занимают сотни миллисекунд CPU. bcrypt
+    отпускает GIL, поэтому в потоках они не останавливают event loop, а
+    размер пула ограничивает, сколько ядер может занять наплыв входов.
+    Задачи сверх workers ждут в очереди; если в ней уже max_queue задач,
+    новая отклоняется с 503, чтобы ожидание не росло без предела.
+    Счётчики меняются только из event loop, поэтому блокировки не нужны.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Выполняет func(*args) в пуле.
+
+        Ошибки:
+            HTTPException: 503 если очередь пула заполнена
+        """
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите попытку позже",
+                headers={"Retry-After": "1"}
+            )
+        self.in_flight += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "peak_queued": self.peak_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+hashing_pool = HashingPool(workers=settings.hashing.workers, max_queue=settings.hashing.max_queue)
+
 
 class Hashed():
+    """Хэширование паролей bcrypt в hashing_pool со стоимостью settings.hashing.bcrypt_rounds"""
+
     @staticmethod
     async def hashed_password(password: str):
-        hpassword = bcrypt.hashpw(
+        hpassword = await hashing_pool.run(
+            bcrypt.hashpw,
             password.encode("utf-8"),
-            bcrypt.gensalt()
+            bcrypt.gensalt(rounds=settings.hashing.bcrypt_rounds)
         )
         return hpassword.decode("utf-8")
     
     @staticmethod
     async def verify_password(password: str, hashed_password: str):
-        current = bcrypt.checkpw(
-            password=password.encode("utf-8"),
-            hashed_password=hashed_password.encode("utf-8")
+        current = await hashing_pool.run(
+            bcrypt.checkpw,
+            password.encode("utf-8"),
+            hashed_password.encode("utf-8")
         )
-        return current
\ No newline at end of file
+        return current
+
+    @staticmethod
+    def needs_rehash(hashed_password: str) -> bool:
+        """Проверяет, отличается ли стоимость хэша ($2b$<rounds>$...) от настроенной"""
+        try:
+            rounds = int(hashed_password.split("$")[2])
+        except (IndexError, ValueError):
+            return True
+        return rounds != settings.hashing.bcrypt_rounds
@@ -1,13 +1,22 @@
 import jwt
 from core.security import auth_jwt
 
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
 from datetime import timedelta
 from datetime import datetime
 from datetime import timezone
 
+# Ключи разбираются из PEM один раз при импорте, а не в каждом encode/decode
+PRIVATE_KEY = load_pem_private_key(auth_jwt.private_key.read_bytes(), password=None)
+PUBLIC_KEY = load_pem_public_key(auth_jwt.public_key.read_bytes())
+
 def encode_jwt(
             payload:dict, 
-            private_key: str = auth_jwt.private_key.read_text(), 
+            private_key: RSAPrivateKey | str = PRIVATE_KEY, 
             algorithm: str = auth_jwt.algorithm,
             expire_timedelta: timedelta | None = None, 
             expire_minutes: int = auth_jwt.access_token_exmpire_min,
@@ -36,7 +45,7 @@ def encode_jwt(
     
 def decode_jwt(
             token:str | bytes, 
-            public_key: str = auth_jwt.public_key.read_text(), 
+            public_key: RSAPublicKey | str = PUBLIC_KEY, 
             algorithm: str = auth_jwt.algorithm
         ):
     decoded = jwt.decode(
@@ -0,0 +1,116 @@
+import time
+import asyncio
+import logging
+
+from typing import Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from database.db import engine
+from database.db import replica_engine
+from database.db import service_engine
+from database.repositories import book as book_repository
+from database.repositories import reader as reader_repository
+from database.repositories import librarian as librarian_repository
+from utils.jwt_utils import encode_jwt
+from utils.jwt_utils import decode_jwt
+
+
+logger = logging.getLogger(__name__)
+
+# Частые запросы с параметрами, которые ничего не находят. Выполнение
+# кладёт их в кэш скомпилированных запросов движка и в кэш подготовленных
+# запросов asyncpg каждого прогретого соединения
+WARM_UP_QUERIES = (
+    (book_repository.SELECT_BOOK, {"book_id": 0}),
+    (book_repository.SELECT_BOOK_EXISTS, {"book_id": 0}),
+    (book_repository.SELECT_BOOKS_PAGE, {"after_id": 0, "limit": 1}),
+    (reader_repository.SELECT_READER_BY_EMAIL, {"email": ""}),
+    (librarian_repository.SELECT_LIBRARIAN_BY_EMAIL, {"email": ""}),
+)
+
+
+class Lifecycle():
+    """
+    Состояние воркера для проб.
+
+    ready выставляется после прогрева и снимается в начале остановки,
+    чтобы балансировщик перестал слать запросы до закрытия соединений с бд.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.stopping = False
+        self.startup_ms: Optional[float] = None
+        self.pool_connections = 0
+        self.replica_connections = 0
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "stopping": self.stopping,
+            "startup_ms": self.startup_ms,
+            "pool_connections": self.pool_connections,
+            "replica_connections": self.replica_connections,
+        }
+
+
+lifecycle = Lifecycle()
+
+
+async def warm_up_pool(session_factory: sessionmaker, connections: int) -> int:
+    """
+    Открывает connections соединений пула одновременно, выполняет на каждом
+    WARM_UP_QUERIES и возвращает соединения в пул.
+
+    Сессии держат соединения, пока не открыты все, иначе пул отдал бы
+    одно и то же соединение нескольким сессиям подряд. Ошибка подключения
+    не останавливает старт: соединение откроет первый запрос.
+
+    Возвращает:
+        int - сколько соединений прогрето
+    """
+    opened = 0
+    all_opened = asyncio.Event()
+
+    async def warm_up_connection() -> None:
+        nonlocal opened
+        async with session_factory() as db:
+            try:
+                await db.connection()
+            finally:
+                opened += 1
+                if opened == connections:
+                    all_opened.set()
+            for statement, params in WARM_UP_QUERIES:
+                await db.execute(statement, params)
+            await all_opened.wait()
+
+    results = await asyncio.gather(*(warm_up_connection() for _ in range(connections)), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        logger.warning("Не удалось прогреть %s из %s соединений: %s", len(errors), connections, errors[0])
+    return connections - len(errors)
+
+
+def warm_up_jwt() -> None:
+    """Подписывает и проверяет токен, чтобы первый вход не платил за инициализацию RSA в OpenSSL"""
+    decode_jwt(encode_jwt({"sub": "warm-up"}))
+
+
+async def cancel_tasks(*tasks: Optional[asyncio.Task]) -> None:
+    """Отменяет фоновые задачи и дожидается их завершения"""
+    tasks = [task for task in tasks if task is not None]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def dispose_engines() -> None:
+    """Закрывает соединения всех движков воркера"""
+    started = time.perf_counter()
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+    await service_engine.dispose()
+    logger.info("Соединения с бд закрыты за %.1f мс", (time.perf_counter() - started) * 1000)
@@ -0,0 +1,37 @@
+import json
+import base64
+
+from fastapi import HTTPException
+from fastapi import status
+
+
+def encode_cursor(*values) -> str:
+    """
+    Упаковывает ключ последней строки страницы в непрозрачный курсор.
+
+    Значения сериализуются в json и кодируются в url-safe base64,
+    так что клиент передаёт курсор обратно как есть, не разбирая его.
+    """
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    Распаковывает курсор, полученный от encode_cursor.
+
+    Ошибки:
+        HTTPException: 400 если курсор повреждён или содержит не size значений
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+    return values
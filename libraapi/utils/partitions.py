@@ -0,0 +1,166 @@
+import re
+import asyncio
+import logging
+
+from datetime import date
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from core.config import settings
+from database.db import service_engine
+
+
+logger = logging.getLogger(__name__)
+
+# inventorydata секционирована по месяцам date_of_issue: секция
+# inventorydata_pYYYYMM хранит выдачи за месяц с 1 числа YYYY-MM
+PARTITIONED_TABLE = "inventorydata"
+PARTITION_NAME = re.compile(r"^inventorydata_p(\d{4})(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITIONED_TABLE}_p{month:%Y%m}"
+
+
+class LoanHorizon():
+    """
+    Нижняя граница date_of_issue открытых выдач.
+
+    Запросы выдачи и возврата ищут только открытые выдачи, а условие
+    date_of_issue >= since отсекает секции, в которых их быть не может:
+    без него postgres проверяет индексы всех подключённых секций.
+
+    Граница - начало месяца самой старой открытой выдачи, но не позже,
+    чем сутки назад: выдача, которую вставляет ещё не закоммиченная
+    транзакция, получает date_of_issue = now() её начала. Открытых
+    выдач со временем выдачи раньше границы не появляется (новые
+    выдачи датируются текущим временем, закрытые не открываются
+    снова), поэтому устаревшее значение только отсекает меньше секций.
+    До первого refresh граница не отсекает ничего.
+    """
+
+    def __init__(self):
+        self.since = datetime.min
+
+    async def refresh(self) -> datetime:
+        async with service_engine.connect() as conn:
+            since = (await conn.execute(text(
+                "SELECT date_trunc('month', LEAST(min(date_of_issue), "
+                "CAST(now() AS timestamp) - interval '1 day')) "
+                f"FROM {PARTITIONED_TABLE} WHERE date_of_return IS NULL"
+            ))).scalar_one()
+        self.since = max(self.since, since)
+        return self.since
+
+
+loan_horizon = LoanHorizon()
+
+
+async def list_partitions(conn: AsyncConnection) -> dict[str, date]:
+    """Возвращает подключённые месячные секции inventorydata: имя -> первый день месяца"""
+    stmt = text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = CAST(:table AS regclass)"
+    ).bindparams(table=PARTITIONED_TABLE)
+    partitions = {}
+    for name in (await conn.execute(statement=stmt)).scalars():
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+async def ensure_partitions(months_ahead: int = settings.partitions.months_ahead) -> list[str]:
+    """
+    Создаёт секции inventorydata с текущего месяца на months_ahead месяцев вперёд.
+
+    Вызывается при старте приложения, периодически из maintain_partitions и
+    командой cli.py partitions. Несколько процессов могут вызвать её
+    одновременно: создание сериализуется advisory-блокировкой.
+
+    Возвращает:
+        list[str] - имена созданных секций
+    """
+    current = date.today().replace(day=1)
+    created = []
+    async with service_engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:table))").bindparams(table=PARTITIONED_TABLE))
+        existing = await list_partitions(conn)
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+            await conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {PARTITIONED_TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+    if created:
+        logger.info("Созданы секции %s", ", ".join(created))
+    return created
+
+
+async def maintain_partitions() -> None:
+    """
+    Фоновая задача приложения: раз в settings.partitions.check_interval секунд
+    досоздаёт секции и сдвигает loan_horizon
+    """
+    while True:
+        try:
+            await ensure_partitions()
+            await loan_horizon.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.warning("Не удалось создать секции %s: %s", PARTITIONED_TABLE, error)
+        await asyncio.sleep(settings.partitions.check_interval)
+
+
+async def archive_partitions(
+        keep_months: int = settings.partitions.keep_months,
+        schema: str = settings.partitions.archive_schema,
+    ) -> list[str]:
+    """
+    Отключает от inventorydata старые секции, в которых все книги возвращены.
+
+    Секция архивируется, если её месяц закончился больше keep_months месяцев
+    назад и в ней нет открытых выдач. Новые выдачи в старые секции не
+    попадают (date_of_issue - время выдачи), а закрытые выдачи уже не
+    меняются, поэтому проверка и отключение не гонятся с записью. Секция
+    отключается DETACH CONCURRENTLY, не блокируя выдачу и возврат, и
+    переносится в схему schema: данные остаются в бд, но запросы к
+    inventorydata, её индексы и vacuum их больше не затрагивают.
+
+    Возвращает:
+        list[str] - имена отключённых секций
+    """
+    cutoff = add_months(date.today().replace(day=1), -keep_months)
+    archived = []
+    async with service_engine.connect() as conn:
+        # DETACH ... CONCURRENTLY нельзя выполнять внутри транзакции
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+        partitions = await list_partitions(conn)
+        for name, month in sorted(partitions.items(), key=lambda item: item[1]):
+            if add_months(month, 1) > cutoff:
+                continue
+            has_open_loans = (await conn.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM {name} WHERE date_of_return IS NULL)"
+            ))).scalar_one()
+            if has_open_loans:
+                continue
+            await conn.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name} CONCURRENTLY"))
+            await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {schema}"))
+            archived.append(name)
+    if archived:
+        logger.info("Отключены секции %s", ", ".join(archived))
+    return archived
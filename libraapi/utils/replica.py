@@ -0,0 +1,170 @@
+import time
+import asyncio
+import logging
+import math
+
+from typing import Optional
+
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from database.db import replica_engine
+
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Клиент, который недавно что-то изменил, читает из основной бд: по
+# cookie (ставится после изменения) или по заголовку в конкретном запросе
+READ_PRIMARY_COOKIE = "read_primary_until"
+READ_PRIMARY_HEADER = "x-read-primary"
+
+# Отставание реплики в секундах. Если реплика применила всё полученное,
+# отставание 0, даже когда на основной бд давно не было записей.
+# На основной бд (не в recovery) функции возвращают NULL и отставание 0
+REPLICA_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaState():
+    """
+    Состояние реплики в процессе: доступна ли она для чтения сейчас.
+
+    GET запрос идёт на реплику, если она настроена и последняя проверка
+    прошла с отставанием не больше max_lag. Свои изменения клиент читает
+    из основной бд по cookie или заголовку (см. ReadYourWritesMiddleware),
+    записи других клиентов на маршрутизацию не влияют.
+
+    Отставание реплики влияет только на кэши процесса: max_lag секунд
+    после изменения каталога или читателей (своего или пришедшего через
+    change_bus) прочитанное с реплики не кладётся в кэши и не отдаётся с
+    ETag, иначе устаревшие данные закрепились бы в кэше, а клиент
+    продолжал бы получать на них 304. Пока реплика не проверена, чтения идут в основную бд.
+    """
+
+    def __init__(self, max_lag: float, check_interval: float, sticky: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky = sticky
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.changed_at = 0.0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return replica_engine is not None
+
+    def note_change(self) -> None:
+        """Отмечает изменение данных, которые процесс кэширует"""
+        self.changed_at = time.monotonic()
+
+    def serves(self, request: Request) -> bool:
+        """Можно ли прочитать данные запроса request из реплики"""
+        if not (self.enabled and self.healthy):
+            return False
+        if request.headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true", "yes"):
+            return False
+        try:
+            until = float(request.cookies.get(READ_PRIMARY_COOKIE, 0))
+        except ValueError:
+            until = 0
+        return until <= time.time()
+
+    def fresh(self, db: AsyncSession) -> bool:
+        """
+        Можно ли положить прочитанное через сессию db в кэши процесса и
+        отдать с ETag: да для основной бд, для реплики - если за max_lag
+        до этого момента кэшируемые данные не менялись
+        """
+        if not db.info.get("replica"):
+            return True
+        return time.monotonic() - self.changed_at > self.max_lag
+
+    def mark_down(self, error: Exception) -> None:
+        """Отмечает реплику недоступной до следующей успешной проверки"""
+        if self.healthy:
+            logger.warning("Реплика недоступна, чтения идут в основную бд: %s", error)
+        self.healthy = False
+        self.error = str(error)
+        self.fallbacks += 1
+
+    async def check(self) -> None:
+        try:
+            async with replica_engine.connect() as conn:
+                lag = float((await conn.execute(statement=REPLICA_LAG)).scalar_one())
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            self.lag = None
+            self.mark_down(error)
+            return
+
+        self.lag = lag
+        if lag > self.max_lag:
+            self.mark_down(RuntimeError(f"отставание {lag:.3f} с больше {self.max_lag} с"))
+            return
+        if not self.healthy:
+            logger.info("Реплика доступна, отставание %.3f с", lag)
+        self.healthy = True
+        self.error = None
+
+    async def monitor(self) -> None:
+        """Фоновая задача приложения: раз в check_interval секунд проверяет реплику"""
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "error": self.error,
+            "fallbacks": self.fallbacks,
+        }
+
+
+replica_state = ReplicaState(
+    max_lag=settings.database.replica_max_lag,
+    check_interval=settings.database.replica_check_interval,
+    sticky=settings.database.replica_sticky,
+)
+
+
+class ReadYourWritesMiddleware():
+    """
+    После успешного изменяющего запроса ставит клиенту cookie, по которой
+    его чтения следующие replica_sticky секунд идут в основную бд.
+
+    Клиенты без cookie могут передать заголовок X-Read-Primary: 1 в
+    запросе, которому нужны только что записанные данные.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS or not replica_state.sticky:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + replica_state.sticky
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{READ_PRIMARY_COOKIE}={until:.3f}; Max-Age={math.ceil(replica_state.sticky)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
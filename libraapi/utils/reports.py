@@ -0,0 +1,143 @@
+import io
+import csv
+import time
+import uuid
+import asyncio
+
+import orjson
+
+from pathlib import Path
+from datetime import datetime
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from core.config import settings
+from database.db import service_engine
+from database.models.inventory import InventoryDataModel
+from database.models.reader import ReaderModel
+from database.models.book import BookModels
+
+
+REPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+OVERDUE_COLUMNS = (
+    InventoryDataModel.id,
+    InventoryDataModel.date_of_issue,
+    InventoryDataModel.reader_id,
+    ReaderModel.fullname,
+    ReaderModel.email,
+    InventoryDataModel.book_id,
+    BookModels.name,
+    BookModels.author,
+)
+
+def new_report_id() -> str:
+    return uuid.uuid4().hex
+
+
+def report_path(report_id: str, report_format: str) -> Path:
+    return settings.reports.dir / f"overdue-{report_id}.{report_format}"
+
+
+def start_report(path: Path) -> None:
+    """
+    Создаёт пустой path.part до ответа клиенту: по нему GET отвечает
+    "pending", пока фоновая задача ещё не начала писать отчёт
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.with_name(path.name + ".part").touch()
+
+
+def purge_reports(keep_days: float = settings.reports.keep_days) -> list[str]:
+    """
+    Удаляет из каталога отчётов файлы, не менявшиеся дольше keep_days дней:
+    готовые отчёты, .error и .part, брошенные остановленным воркером.
+
+    Возвращает:
+        list[str] - имена удалённых файлов
+    """
+    cutoff = time.time() - keep_days * 24 * 60 * 60
+    removed = []
+    for file in settings.reports.dir.glob("overdue-*"):
+        try:
+            if file.stat().st_mtime < cutoff:
+                file.unlink()
+                removed.append(file.name)
+        except FileNotFoundError:
+            # Файл удалил параллельный запрос
+            continue
+    return removed
+
+
+def encode_rows(rows: list, report_format: str, header: bool) -> bytes:
+    """Кодирует пачку строк отчёта в NDJSON или CSV"""
+    buffer = io.StringIO()
+    if report_format == "csv":
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow([column.key for column in OVERDUE_COLUMNS] + ["days_overdue"])
+        writer.writerows(rows)
+    else:
+        keys = [column.key for column in OVERDUE_COLUMNS] + ["days_overdue"]
+        for row in rows:
+            buffer.write(orjson.dumps(dict(zip(keys, row))).decode("utf-8"))
+            buffer.write("\n")
+    return buffer.getvalue().encode("utf-8")
+
+
+async def write_overdue_report(
+        path: Path,
+        report_format: str,
+        loan_period_days: int = settings.reports.loan_period_days,
+    ) -> int:
+    """
+    Выгружает в файл выдачи, не возвращённые дольше loan_period_days дней.
+
+    Строки читаются серверным курсором пачками по settings.reports.batch_size, так
+    что память не зависит от размера отчёта. Отчёт пишется во временный файл
+    path.part и переименовывается в path только после успешного завершения;
+    при ошибке рядом остаётся path.error с её текстом.
+
+    Возвращает:
+        int - количество строк в отчёте
+    """
+    now = datetime.now()
+    deadline = now - timedelta(days=loan_period_days)
+    stmt = select(*OVERDUE_COLUMNS)\
+            .join(ReaderModel, ReaderModel.id == InventoryDataModel.reader_id)\
+            .join(BookModels, BookModels.id == InventoryDataModel.book_id)\
+            .where(
+                InventoryDataModel.date_of_return == None,
+                InventoryDataModel.date_of_issue < deadline
+                )\
+            .order_by(InventoryDataModel.date_of_issue)\
+            .execution_options(yield_per=settings.reports.batch_size)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part = path.with_name(path.name + ".part")
+    total = 0
+    try:
+        with open(part, "wb") as file:
+            async with service_engine.connect() as conn:
+                result = await conn.stream(stmt)
+                async for partition in result.partitions():
+                    rows = [
+                        (*row, (now - row.date_of_issue).days - loan_period_days)
+                        for row in partition
+                    ]
+                    chunk = encode_rows(rows, report_format, header=total == 0)
+                    await asyncio.to_thread(file.write, chunk)
+                    total += len(rows)
+            if total == 0 and report_format == "csv":
+                file.write(encode_rows([], report_format, header=True))
+        part.replace(path)
+    except Exception as error:
+        # .error появляется раньше, чем пропадает .part, чтобы GET не увидел отчёт пропавшим
+        path.with_name(path.name + ".error").write_text(str(error))
+        part.unlink(missing_ok=True)
+        raise
+    return total
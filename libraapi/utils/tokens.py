@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+from datetime import datetime
+from datetime import timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from database.db import service_engine
+from database.repositories import librarian as librarian_repository
+
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_expired_tokens() -> int:
+    """
+    Удаляет из refresh_tokens истёкшие токены.
+
+    Каждый вход и обновление добавляют строку, а использованные и
+    отозванные токены остаются для обнаружения повторного использования.
+    Истёкший токен отклоняется ещё при проверке jwt, поэтому его строка
+    уже ни на что не влияет.
+
+    Возвращает:
+        int - число удалённых токенов
+    """
+    async with AsyncSession(service_engine) as db:
+        purged = await librarian_repository.purge_refresh_tokens(db, datetime.now(timezone.utc))
+        await db.commit()
+    return purged
+
+
+async def maintain_tokens() -> None:
+    """Фоновая задача приложения: раз в settings.tokens.purge_interval секунд удаляет истёкшие токены"""
+    while True:
+        try:
+            purged = await purge_expired_tokens()
+            if purged:
+                logger.info("Удалено истёкших refresh токенов: %s", purged)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.warning("Не удалось удалить истёкшие refresh токены: %s", error)
+        await asyncio.sleep(settings.tokens.purge_interval)
@@ -1,14 +1,42 @@
+import time
+import hashlib
+
 from fastapi import Depends
 from typing import Optional
 from fastapi import HTTPException
 from fastapi.security import HTTPBearer
 
 from utils.jwt_utils import decode_jwt
+from utils.cache import token_cache
+
+
+def verify_token(token: str) -> dict:
+    """
+    Проверяет подпись и срок токена с кэшированием результата.
+
+    Проверка RS256 - самая дорогая часть авторизованного запроса, а клиент
+    повторяет один и тот же токен до его истечения. Уже проверенный токен
+    хранится в token_cache по sha256 от токена (сам токен в памяти не
+    держим) и считается валидным до своего exp, но не дольше ttl кэша.
+
+    Ошибки:
+        jwt.PyJWTError: если токен некорректен или истёк
+    """
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            return payload
+        token_cache.invalidate(key)
+
+    payload = decode_jwt(token)
+    token_cache.set(key, payload)
+    return payload
 
 
 async def get_current_user(token: str = Depends(HTTPBearer())) -> Optional[dict]:
     try:
-        payload = decode_jwt(token.credentials)
+        payload = verify_token(token.credentials)
         if payload.get("type") == "refresh":
             raise HTTPException(
                 status_code=403, 
@@ -20,4 +48,3 @@ async def get_current_user(token: str = Depends(HTTPBearer())) -> Optional[dict]
             status_code=401, 
             detail="Invalid or expired token"
         )
-
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from sqlalchemy import text
+
+from database.db import engine
+from main import run_migrations
+from main import configure_logging
+from utils.partitions import ensure_partitions
+from utils.partitions import loan_horizon
+from utils.lifecycle import dispose_engines
+
+
+async def ping_database() -> None:
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(statement=text("SELECT 1"))
+    finally:
+        await engine.dispose()
+
+
+async def prepare_partitions() -> None:
+    """То, что при старте делает lifespan: httpx.ASGITransport его не запускает"""
+    try:
+        await ensure_partitions()
+        await loan_horizon.refresh()
+    finally:
+        await dispose_engines()
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    Postgres из настроек приложения (DBHOST, DBPORT, DBUSER, ...).
+
+    Перед тестами применяются миграции alembic и создаются секции
+    inventorydata, как при запуске приложения. Тесты создают свои строки
+    и удаляют их за собой, остальные данные бд не трогают. Если бд
+    недоступна или миграции не применяются, тест пропускается с причиной.
+    """
+    try:
+        asyncio.run(ping_database())
+    except Exception as error:
+        pytest.skip(f"Postgres недоступен: {error}")
+
+    try:
+        run_migrations()
+    except Exception as error:
+        pytest.skip(f"Не удалось применить миграции: {error}")
+    finally:
+        configure_logging()
+
+    asyncio.run(prepare_partitions())
@@ -0,0 +1,148 @@
+"""
+Параллельные выдачи и возвраты через API: остаток книги не уходит в
+минус, у читателя не бывает больше settings.inventory.max_open_loans открытых
+выдач, каждая выдача закрывается ровно один раз.
+"""
+import uuid
+import asyncio
+
+import httpx
+
+from sqlalchemy import text
+
+from core.config import settings
+from database.db import engine
+from main import app
+from utils.jwt_utils import encode_jwt
+
+
+# Экземпляров больше, чем лимит одного читателя, и меньше, чем
+# суммарный лимит всех читателей: упираются и в лимит, и в остаток
+AMOUNT = settings.inventory.max_open_loans + 2
+READERS = 4
+REQUESTS = 40
+
+HEADERS = {"Authorization": "Bearer " + encode_jwt({"sub": "concurrency@example.com", "type": "access"})}
+
+
+async def create_rows() -> tuple[int, list[int]]:
+    suffix = uuid.uuid4().hex
+    async with engine.begin() as conn:
+        book_id = (await conn.execute(
+            text("INSERT INTO books (name, author, amount) VALUES (:name, 'test', :amount) RETURNING id"),
+            {"name": f"concurrency-{suffix}", "amount": AMOUNT}
+        )).scalar_one()
+        reader_ids = [
+            (await conn.execute(
+                text("INSERT INTO reader (fullname, email) VALUES ('test', :email) RETURNING id"),
+                {"email": f"concurrency-{suffix}-{index}@example.com"}
+            )).scalar_one()
+            for index in range(READERS)
+        ]
+    return book_id, reader_ids
+
+
+async def delete_rows(book_id: int, reader_ids: list[int]) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM inventorydata WHERE reader_id = ANY(:ids)"), {"ids": reader_ids})
+        await conn.execute(text("DELETE FROM circulation_monthly WHERE book_id = :id"), {"id": book_id})
+        await conn.execute(text("DELETE FROM circulation_books WHERE book_id = :id"), {"id": book_id})
+        await conn.execute(text("DELETE FROM books WHERE id = :id"), {"id": book_id})
+        await conn.execute(text("DELETE FROM reader WHERE id = ANY(:ids)"), {"ids": reader_ids})
+
+
+async def fetch_state(book_id: int, reader_ids: list[int]) -> tuple[int, dict[int, int]]:
+    """Возвращает остаток книги и reader_id -> число открытых выдач"""
+    async with engine.connect() as conn:
+        amount = (await conn.execute(
+            text("SELECT amount FROM books WHERE id = :id"), {"id": book_id}
+        )).scalar_one()
+        open_loans = dict((await conn.execute(
+            text(
+                "SELECT reader_id, count(*) FROM inventorydata "
+                "WHERE reader_id = ANY(:ids) AND date_of_return IS NULL GROUP BY reader_id"
+            ),
+            {"ids": reader_ids}
+        )).all())
+    return amount, open_loans
+
+
+def check_state(amount: int, open_loans: dict[int, int]) -> None:
+    assert amount >= 0
+    assert all(count <= settings.inventory.max_open_loans for count in open_loans.values())
+    assert amount + sum(open_loans.values()) == AMOUNT
+
+
+async def watch(book_id: int, reader_ids: list[int], stop: asyncio.Event) -> int:
+    """Проверяет инварианты, пока идут запросы, возвращает число проверок"""
+    checks = 0
+    while not stop.is_set():
+        amount, open_loans = await fetch_state(book_id, reader_ids)
+        assert amount >= 0
+        assert all(count <= settings.inventory.max_open_loans for count in open_loans.values())
+        checks += 1
+    return checks
+
+
+async def issue(client: httpx.AsyncClient, book_id: int, reader_id: int) -> httpx.Response:
+    return await client.post("/inventory/issue/", json={"book_id": book_id, "reader_id": reader_id}, headers=HEADERS)
+
+
+async def give_back(client: httpx.AsyncClient, book_id: int, loan_id: int) -> httpx.Response:
+    return await client.post("/inventory/return/", json={"book_id": book_id, "id": loan_id}, headers=HEADERS)
+
+
+async def run_scenario() -> None:
+    book_id, reader_ids = await create_rows()
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch(book_id, reader_ids, stop))
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # Один читатель разом просит больше книг, чем разрешает лимит:
+            # выдано ровно max_open_loans, остальным 409
+            responses = await asyncio.gather(*[
+                issue(client, book_id, reader_ids[0]) for _ in range(REQUESTS)
+            ])
+            assert {response.status_code for response in responses} <= {200, 409}
+            loan_ids = [response.json()["id"] for response in responses if response.status_code == 200]
+            assert len(loan_ids) == settings.inventory.max_open_loans
+            check_state(*await fetch_state(book_id, reader_ids))
+
+            # Все читатели разом разбирают оставшиеся экземпляры: книга
+            # выдана ровно AMOUNT раз, остаток не ушёл в минус
+            responses = await asyncio.gather(*[
+                issue(client, book_id, reader_ids[index % READERS]) for index in range(REQUESTS)
+            ])
+            assert {response.status_code for response in responses} <= {200, 409}
+            loan_ids += [response.json()["id"] for response in responses if response.status_code == 200]
+            assert len(loan_ids) == AMOUNT
+            check_state(*await fetch_state(book_id, reader_ids))
+
+            # Каждая выдача возвращается дважды одновременно с новыми выдачами
+            returns = [give_back(client, book_id, loan_id) for loan_id in loan_ids * 2]
+            issues = [issue(client, book_id, reader_ids[index % READERS]) for index in range(REQUESTS)]
+            responses = await asyncio.gather(*returns, *issues)
+            returned = responses[:len(returns)]
+            issued = responses[len(returns):]
+            assert sorted(response.status_code for response in returned) == [200] * len(loan_ids) + [404] * len(loan_ids)
+            assert {response.status_code for response in issued} <= {200, 409}
+            check_state(*await fetch_state(book_id, reader_ids))
+
+            # Оставшиеся выдачи закрываются, книга снова вся на полке
+            loan_ids = [response.json()["id"] for response in issued if response.status_code == 200]
+            responses = await asyncio.gather(*[give_back(client, book_id, loan_id) for loan_id in loan_ids])
+            assert {response.status_code for response in responses} <= {200}
+            assert await fetch_state(book_id, reader_ids) == (AMOUNT, {})
+    finally:
+        stop.set()
+        try:
+            checks = await watcher
+        finally:
+            await delete_rows(book_id, reader_ids)
+            await engine.dispose()
+    assert checks > 0
+
+
+def test_concurrent_issue_and_return(database):
+    asyncio.run(run_scenario())